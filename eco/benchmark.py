@@ -0,0 +1,628 @@
+"""Benchmark e teste de carga da API de restaurantes
+
+Popula um banco separado (DB_NAME de benchmark) com um catálogo sintético no
+formato de RESTAURANT_DATA, dispara cada rota de restaurants.py com
+concorrência controlada e grava throughput e latências (p50/p95/p99) em JSON.
+
+Por padrão o cache de leitura fica desligado (--cache-ttl 0), para medir o
+caminho até o MongoDB; rode com --cache-ttl 60 para medir o caso com cache.
+
+Exemplos:
+    python benchmark.py --size 100000 --concurrency 20 --output atual.json
+    python benchmark.py --skip-seed --baseline atual.json --max-regression 15
+    python benchmark.py --size 1000000 --scenarios list_default --page-depths 1,10,100,1000
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import re
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+from dotenv import load_dotenv
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+# Palavras usadas para montar nomes sintéticos (o índice no final garante nomes únicos)
+NAME_PREFIXES = ["Restaurante", "Pousada", "Bar", "Cantina", "Espaço", "Recanto", "Casa", "Balneário"]
+NAME_WORDS = [
+    "Farol", "Estrelas", "Telha", "Brasa", "Açaí", "Ilha", "Rio", "Igarapé", "Maré", "Várzea",
+    "Tucupi", "Jambu", "Cumaru", "Samaúma", "Boto", "Garça", "Curuperé", "Tambaqui", "Cupuaçu", "Bacuri"
+]
+CUISINES = ["Brasileira", "Frutos do mar", "Regional", "Paraense", "Churrasco", "Bar", "Pizza", "Vegetariana"]
+HOURS = ["Almoço - das 11h às 15h", "Todos os dias - 10h às 22h", "Conforme temporada - consulte disponibilidade"]
+
+# Cenários de escrita consomem e produzem restaurantes; rodam depois das leituras
+READ_SCENARIOS = [
+    "categories", "list_default", "list_category", "list_categories_all", "list_has_pool",
+    "list_rating_range", "list_combined", "list_fields", "list_text_search", "list_prefix_search",
+    "list_near", "list_facets", "list_deep_skip", "list_deep_cursor", "get_by_id",
+    "suggestions", "stats_overview", "export_ndjson"
+]
+WRITE_SCENARIOS = ["create", "create_bulk", "update", "patch", "update_bulk", "delete", "delete_bulk"]
+
+# Restaurantes por requisição nos cenários de escrita em lote
+BULK_SIZE = 10
+
+# Profundidade (em páginas) usada para comparar skip com cursor
+DEEP_PAGE = 200
+PAGE_SIZE = 20
+DEFAULT_PAGE_DEPTHS = "1,10,100,1000"
+
+# Limites das verificações absolutas (valem mesmo sem --baseline):
+# a página mais profunda por cursor pode custar até 2x a primeira (+2 ms de
+# folga para ruído) e a exportação completa pode usar até 32 MB a mais de RSS
+# que a pequena
+PAGINATION_MAX_RATIO = 2.0
+PAGINATION_SLACK_MS = 2.0
+EXPORT_RSS_TOLERANCE_KB = 32 * 1024
+
+def synthetic_restaurants(count: int, seed: int = 42):
+    """Gera restaurantes sintéticos no formato de RESTAURANT_DATA, já prontos para gravação
+
+    Os documentos são montados direto como dicionários (sem o modelo) para que
+    catálogos de milhões de itens possam ser gerados rapidamente.
+    """
+    from models.restaurant import ALL_CATEGORIES, CATEGORIES, name_key
+    from seet_data import KNOWN_PLACES
+
+    rng = random.Random(seed)
+    category_ids = [category["id"] for category in CATEGORIES if category["id"] != ALL_CATEGORIES]
+    started = datetime.utcnow() - timedelta(days=365)
+
+    for position in range(count):
+        place, (lat, lng) = rng.choice(KNOWN_PLACES)
+        name = f"{rng.choice(NAME_PREFIXES)} {rng.choice(NAME_WORDS)} {rng.choice(NAME_WORDS)} {position}"
+        has_pool = rng.random() < 0.3
+        categories = rng.sample(category_ids, rng.randint(1, 3))
+        if has_pool and "piscina" in category_ids and "piscina" not in categories:
+            categories.append("piscina")
+        created_at = started + timedelta(seconds=rng.randint(0, 365 * 24 * 3600))
+        yield {
+            "id": str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            "name": name,
+            "name_key": name_key(name),
+            "image": f"https://images.example.com/restaurants/{position}.jpg",
+            "instagram": f"@restaurante{position}",
+            "hasPool": has_pool,
+            "hours": rng.choice(HOURS),
+            "phones": [f"(91) 9{rng.randint(1000, 9999)}-{rng.randint(1000, 9999)}"],
+            "email": None,
+            "categories": categories,
+            "location": f"{rng.uniform(0.5, 15):.1f} km - {place.title()}",
+            "geo": {
+                "type": "Point",
+                "coordinates": [round(lng + rng.uniform(-0.05, 0.05), 6), round(lat + rng.uniform(-0.05, 0.05), 6)]
+            },
+            "comments": f"{rng.randint(0, 500)} avaliações",
+            "rating": round(rng.uniform(2.5, 5.0), 1) if rng.random() < 0.9 else None,
+            "cuisine": ", ".join(rng.sample(CUISINES, 2)),
+            "created_at": created_at,
+            "updated_at": created_at
+        }
+
+async def seed_catalog(db, size: int, batch_size: int = 5000, seed: int = 42):
+    """Recria a coleção de restaurantes do banco de benchmark com `size` documentos"""
+    from indexes import ensure_indexes
+    from stats import rebuild_stats
+
+    await db.restaurants.drop()
+    await db.restaurant_stats.drop()
+    await ensure_indexes(db)
+
+    started = time.perf_counter()
+    batch = []
+    for document in synthetic_restaurants(size, seed):
+        batch.append(document)
+        if len(batch) >= batch_size:
+            await db.restaurants.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        await db.restaurants.insert_many(batch, ordered=False)
+    await rebuild_stats(db)
+
+    elapsed = time.perf_counter() - started
+    print(f"🌱 {size} restaurantes sintéticos inseridos em {elapsed:.1f}s", file=sys.stderr)
+    return {"documents": size, "seconds": round(elapsed, 3)}
+
+class BenchmarkContext:
+    """Dados compartilhados pelos cenários (ids, nomes, cursores e restaurantes criados)"""
+
+    def __init__(self, rng: random.Random):
+        self.rng = rng
+        self.ids: List[str] = []
+        self.names: List[str] = []
+        self.deep_cursor: Optional[str] = None
+        self.created_ids: List[str] = []
+        self.counter = 0
+
+    def new_restaurant(self) -> dict:
+        self.counter += 1
+        return {
+            "name": f"Benchmark {uuid.uuid4().hex[:12]} {self.counter}",
+            "image": "https://images.example.com/restaurants/benchmark.jpg",
+            "hours": HOURS[0],
+            "phones": ["(91) 90000-0000"],
+            "categories": ["restaurants"],
+            "location": "3.6 km de Cotijuba",
+            "rating": 4.0,
+            "cuisine": "Regional"
+        }
+
+    def random_id(self) -> str:
+        return self.rng.choice(self.ids)
+
+    def random_query(self) -> str:
+        word = self.rng.choice(NAME_WORDS)
+        return word[:self.rng.randint(2, len(word))]
+
+async def load_context(db, context: BenchmarkContext, sample_size: int = 1000):
+    """Amostra ids e nomes do catálogo e calcula o cursor da página profunda"""
+    from restaurants import LIST_SORT, encode_cursor
+
+    sample = await db.restaurants.aggregate([
+        {"$sample": {"size": sample_size}},
+        {"$project": {"_id": 0, "id": 1, "name": 1}}
+    ]).to_list(None)
+    context.ids = [restaurant["id"] for restaurant in sample]
+    context.names = [restaurant["name"] for restaurant in sample]
+
+    deep = await db.restaurants.find({}, {"_id": 0, "id": 1, "name": 1}).sort(LIST_SORT).skip(
+        DEEP_PAGE * PAGE_SIZE - 1
+    ).limit(1).to_list(1)
+    if deep:
+        context.deep_cursor = encode_cursor(deep[0]["name"], deep[0]["id"])
+
+def build_scenarios() -> Dict[str, Callable]:
+    """Cenários: cada um recebe (client, context) e faz uma requisição"""
+
+    async def list_with(client, **params):
+        return await client.get("/restaurants/", params={"limit": PAGE_SIZE, **params})
+
+    async def create(client, context):
+        response = await client.post("/restaurants/", json=context.new_restaurant())
+        if response.status_code == 200:
+            context.created_ids.append(response.json()["id"])
+        return response
+
+    async def create_bulk(client, context):
+        response = await client.post("/restaurants/bulk", json=[context.new_restaurant() for _ in range(BULK_SIZE)])
+        if response.status_code == 200:
+            context.created_ids.extend(
+                result["id"] for result in response.json()["results"] if result.get("status") == "created"
+            )
+        return response
+
+    async def update(client, context):
+        restaurant_id = context.rng.choice(context.created_ids or context.ids)
+        return await client.put(f"/restaurants/{restaurant_id}", json={"rating": round(context.rng.uniform(0, 5), 1)})
+
+    async def patch(client, context):
+        restaurant_id = context.rng.choice(context.created_ids or context.ids)
+        return await client.patch(f"/restaurants/{restaurant_id}", json={"hasPool": context.rng.random() < 0.5})
+
+    async def update_bulk(client, context):
+        pool = context.created_ids if len(context.created_ids) >= BULK_SIZE else context.ids
+        ids = context.rng.sample(pool, min(BULK_SIZE, len(pool)))
+        return await client.put(
+            "/restaurants/bulk",
+            json=[{"id": restaurant_id, "rating": round(context.rng.uniform(0, 5), 1)} for restaurant_id in ids]
+        )
+
+    async def delete(client, context):
+        if not context.created_ids:
+            return None
+        return await client.delete(f"/restaurants/{context.created_ids.pop()}")
+
+    async def delete_bulk(client, context):
+        ids = [context.created_ids.pop() for _ in range(min(BULK_SIZE, len(context.created_ids)))]
+        if not ids:
+            return None
+        return await client.post("/restaurants/bulk/delete", json=ids)
+
+    async def export_ndjson(client, context):
+        params = {"format": "ndjson", "category": context.rng.choice(["piscina", "rio-guama"])}
+        async with client.stream("GET", "/restaurants/export", params=params) as response:
+            async for _ in response.aiter_bytes():
+                pass
+        return response
+
+    return {
+        "categories": lambda client, context: client.get("/restaurants/categories"),
+        "list_default": lambda client, context: list_with(client),
+        "list_category": lambda client, context: list_with(client, category=context.rng.choice(["piscina", "rio-guama", "restaurants"])),
+        "list_categories_all": lambda client, context: list_with(client, category="restaurants,piscina", category_mode="all"),
+        "list_has_pool": lambda client, context: list_with(client, hasPool=context.rng.random() < 0.5),
+        "list_rating_range": lambda client, context: list_with(client, rating_min=round(context.rng.uniform(3, 4.5), 1), rating_max=5),
+        "list_combined": lambda client, context: list_with(
+            client, category="restaurants", hasPool=True, rating_min=round(context.rng.uniform(3, 4.5), 1)
+        ),
+        "list_fields": lambda client, context: list_with(client, fields="name,rating,location"),
+        "list_text_search": lambda client, context: list_with(client, search=context.rng.choice(NAME_WORDS)),
+        "list_prefix_search": lambda client, context: list_with(client, search=context.random_query(), search_mode="prefix"),
+        "list_near": lambda client, context: list_with(client, near="-1.4977,-48.4697", max_km=round(context.rng.uniform(2, 20), 1)),
+        "list_facets": lambda client, context: list_with(client, category="restaurants", facets="categories,hasPool,rating_bucket"),
+        "list_deep_skip": lambda client, context: list_with(client, skip=DEEP_PAGE * PAGE_SIZE),
+        "list_deep_cursor": lambda client, context: list_with(client, cursor=context.deep_cursor),
+        "get_by_id": lambda client, context: client.get(f"/restaurants/{context.random_id()}"),
+        "suggestions": lambda client, context: client.get("/restaurants/search/suggestions", params={"q": context.random_query()}),
+        "stats_overview": lambda client, context: client.get("/restaurants/stats/overview"),
+        "export_ndjson": export_ndjson,
+        "create": create,
+        "create_bulk": create_bulk,
+        "update": update,
+        "patch": patch,
+        "update_bulk": update_bulk,
+        "delete": delete,
+        "delete_bulk": delete_bulk
+    }
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Percentil pelo método nearest-rank"""
+    if not sorted_values:
+        return 0.0
+    rank = math.ceil(fraction * len(sorted_values))
+    return sorted_values[min(max(rank, 1), len(sorted_values)) - 1]
+
+def summarize(latencies: List[float], errors: int, skipped: int, elapsed: float) -> dict:
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "skipped": skipped,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed > 0 else 0.0,
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "max_ms": round(latencies[-1] * 1000, 3) if latencies else 0.0
+    }
+
+async def run_scenario(client, scenario: Callable, context: BenchmarkContext, requests: int, concurrency: int) -> dict:
+    """Executa `requests` chamadas do cenário com no máximo `concurrency` em paralelo"""
+    latencies: List[float] = []
+    errors = 0
+    skipped = 0
+    remaining = iter(range(requests))
+
+    async def worker():
+        nonlocal errors, skipped
+        for _ in remaining:
+            started = time.perf_counter()
+            response = await scenario(client, context)
+            elapsed = time.perf_counter() - started
+            if response is None:
+                skipped += 1
+                continue
+            latencies.append(elapsed)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, errors, skipped, time.perf_counter() - started)
+
+async def measure_pagination(client, db, depths: List[int], requests: int) -> dict:
+    """Latência da página N (1 a 1000) por cursor e por skip, uma requisição por vez"""
+    from restaurants import LIST_SORT, encode_cursor
+
+    total = await db.restaurants.estimated_document_count()
+    result = {}
+    for depth in depths:
+        offset = (depth - 1) * PAGE_SIZE
+        if offset >= total:
+            result[str(depth)] = {"skipped": f"o catálogo tem só {total} restaurantes"}
+            continue
+
+        cursor = None
+        if offset:
+            last = await db.restaurants.find({}, {"_id": 0, "id": 1, "name": 1}).sort(LIST_SORT).skip(
+                offset - 1
+            ).limit(1).to_list(1)
+            cursor = encode_cursor(last[0]["name"], last[0]["id"])
+
+        result[str(depth)] = {}
+        for variant, params in (("cursor", {"cursor": cursor} if cursor else {}), ("skip", {"skip": offset} if offset else {})):
+            latencies = []
+            errors = 0
+            started = time.perf_counter()
+            for _ in range(requests):
+                request_started = time.perf_counter()
+                response = await client.get("/restaurants/", params={"limit": PAGE_SIZE, **params})
+                latencies.append(time.perf_counter() - request_started)
+                errors += response.status_code >= 400
+            result[str(depth)][variant] = summarize(latencies, errors, 0, time.perf_counter() - started)
+    return result
+
+async def measure_suggestions_vs_regex(client, db, context: BenchmarkContext, requests: int, in_process: bool) -> dict:
+    """Compara /search/suggestions (índice em memória) com a consulta por regex que ele substituiu"""
+    queries = [context.random_query() for _ in range(requests)]
+
+    async def timed(call) -> dict:
+        latencies = []
+        started = time.perf_counter()
+        for query in queries:
+            request_started = time.perf_counter()
+            await call(query)
+            latencies.append(time.perf_counter() - request_started)
+        return summarize(latencies, 0, 0, time.perf_counter() - started)
+
+    result = {
+        "suggestions_http": await timed(
+            lambda query: client.get("/restaurants/search/suggestions", params={"q": query})
+        ),
+        # Consulta usada por /search/suggestions antes do índice em memória
+        "regex_query": await timed(
+            lambda query: db.restaurants.find(
+                {"name": {"$regex": re.escape(query), "$options": "i"}}, {"name": 1, "_id": 0}
+            ).limit(5).to_list(5)
+        )
+    }
+    if in_process:
+        from restaurants import name_index
+
+        async def search(query):
+            return name_index.search(query, limit=5)
+
+        result["name_index"] = await timed(search)
+    return result
+
+def current_rss_kb() -> Optional[int]:
+    """RSS atual do processo em KB (lido de /proc; None fora do Linux)"""
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+async def measure_export_memory(rating_min: Optional[float] = None) -> dict:
+    """Crescimento do RSS durante uma exportação NDJSON
+
+    O corpo é lido direto da StreamingResponse: o ASGITransport do httpx junta
+    a resposta inteira antes de entregá-la, o que mediria o cliente, não a API.
+    """
+    from restaurants import export_restaurants
+
+    response = await export_restaurants(
+        format="ndjson", category=None, category_mode="any", hasPool=None,
+        rating_min=rating_min, rating_max=None, fields=None, batch_size=500
+    )
+    started = time.perf_counter()
+    start_rss = peak_rss = current_rss_kb()
+    rows = 0
+    received = 0
+    async for chunk in response.body_iterator:
+        rows += 1
+        received += len(chunk)
+        if rows % 1000 == 0:
+            peak_rss = max(peak_rss, current_rss_kb())
+    peak_rss = max(peak_rss, current_rss_kb())
+    return {
+        "rows": rows,
+        "bytes": received,
+        "seconds": round(time.perf_counter() - started, 3),
+        "rss_growth_kb": peak_rss - start_rss
+    }
+
+async def compare_export_memory() -> dict:
+    """Exporta um recorte pequeno e depois o catálogo inteiro; o RSS não deve acompanhar o tamanho"""
+    if current_rss_kb() is None:
+        return {"skipped": "RSS indisponível neste sistema"}
+    # Aquece o alocador e os caches de importação antes de medir
+    await measure_export_memory(rating_min=4.9)
+    small = await measure_export_memory(rating_min=4.9)
+    full = await measure_export_memory()
+    return {
+        "small": small,
+        "full": full,
+        "flat": full["rss_growth_kb"] - small["rss_growth_kb"] < EXPORT_RSS_TOLERANCE_KB
+    }
+
+async def measure_serialization(db, documents: int = 1000, rounds: int = 20) -> dict:
+    """Compara a serialização direta (public_document + dumps) com a validação pelo modelo"""
+    from fastapi.encoders import jsonable_encoder
+    from models.restaurant import Restaurant
+    from responses import dumps, public_document
+
+    sample = await db.restaurants.find({}, {"_id": 0}).limit(documents).to_list(documents)
+
+    def timed(serialize) -> float:
+        started = time.perf_counter()
+        for _ in range(rounds):
+            serialize()
+        return (time.perf_counter() - started) / rounds * 1000
+
+    return {
+        "documents": len(sample),
+        "public_document_ms": round(timed(lambda: dumps([public_document(doc) for doc in sample])), 3),
+        "pydantic_model_ms": round(
+            timed(lambda: json.dumps(jsonable_encoder([Restaurant(**doc) for doc in sample])).encode("utf-8")), 3
+        )
+    }
+
+def check_invariants(results: dict) -> List[str]:
+    """Verificações que não dependem de um resultado anterior"""
+    failures = []
+
+    pagination = {
+        int(depth): timings for depth, timings in results.get("pagination", {}).items() if "cursor" in timings
+    }
+    if len(pagination) > 1:
+        first = pagination[min(pagination)]["cursor"]["p50_ms"]
+        deepest = max(pagination)
+        deep = pagination[deepest]["cursor"]["p50_ms"]
+        if deep > first * PAGINATION_MAX_RATIO + PAGINATION_SLACK_MS:
+            failures.append(f"paginação por cursor: p50 da página {deepest} {deep} ms contra {first} ms na primeira")
+
+    export_memory = results.get("export_memory", {})
+    if export_memory.get("flat") is False:
+        failures.append(
+            f"exportação: RSS subiu {export_memory['full']['rss_growth_kb']} KB no catálogo inteiro "
+            f"contra {export_memory['small']['rss_growth_kb']} KB no recorte pequeno"
+        )
+    return failures
+
+def find_regressions(results: dict, baseline: dict, max_regression: float) -> List[str]:
+    """Lista cenários cujo p95 subiu ou throughput caiu mais que `max_regression` %"""
+    regressions = []
+    limit = max_regression / 100
+    if results["meta"].get("cache_ttl_seconds") != baseline.get("meta", {}).get("cache_ttl_seconds"):
+        print("⚠️ O resultado anterior usou outro CACHE_TTL_SECONDS; a comparação pode não valer", file=sys.stderr)
+    for name, current in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous or not previous.get("requests") or not current["requests"]:
+            continue
+        if previous["p95_ms"] > 0 and current["p95_ms"] > previous["p95_ms"] * (1 + limit):
+            regressions.append(f"{name}: p95 {previous['p95_ms']} ms -> {current['p95_ms']} ms")
+        if previous["throughput_rps"] > 0 and current["throughput_rps"] < previous["throughput_rps"] * (1 - limit):
+            regressions.append(
+                f"{name}: throughput {previous['throughput_rps']} -> {current['throughput_rps']} req/s"
+            )
+        if current["errors"] > previous.get("errors", 0):
+            regressions.append(f"{name}: {current['errors']} erros (antes {previous.get('errors', 0)})")
+    return regressions
+
+def create_app():
+    """App em processo com as mesmas rotas da API"""
+    from fastapi import FastAPI
+    import database
+    import restaurants
+
+    app = FastAPI(lifespan=database.lifespan)
+    app.include_router(restaurants.router)
+    app.include_router(database.router)
+    return app
+
+async def run_benchmark(args) -> dict:
+    import httpx
+    from database import MongoSettings, mongo
+
+    settings = MongoSettings.from_env()
+    settings.db_name = args.db_name
+    mongo.connect(settings)
+
+    report = {
+        "meta": {
+            "started_at": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "db_name": args.db_name,
+            "size": args.size,
+            "requests_per_scenario": args.requests,
+            "concurrency": args.concurrency,
+            "seed": args.seed,
+            "cache_backend": os.environ.get("CACHE_BACKEND", "memory"),
+            "cache_ttl_seconds": args.cache_ttl if not args.url else None,
+            "target": args.url or "in-process"
+        },
+        "scenarios": {}
+    }
+
+    if not args.skip_seed:
+        report["seed"] = await seed_catalog(mongo.db, args.size, args.batch_size, args.seed)
+    report["meta"]["documents"] = await mongo.db.restaurants.estimated_document_count()
+
+    context = BenchmarkContext(random.Random(args.seed))
+    await load_context(mongo.db, context)
+
+    page_depths = [int(depth) for depth in args.page_depths.split(",")]
+    scenarios = build_scenarios()
+    selected = args.scenarios.split(",") if args.scenarios else READ_SCENARIOS + WRITE_SCENARIOS
+    unknown = [name for name in selected if name not in scenarios]
+    if unknown:
+        raise SystemExit(f"Cenários desconhecidos: {', '.join(unknown)}")
+
+    async def run_all(client):
+        for name in selected:
+            requests = args.export_requests if name == "export_ndjson" else args.requests
+            report["scenarios"][name] = await run_scenario(client, scenarios[name], context, requests, args.concurrency)
+            print(
+                f"⏱️ {name}: {report['scenarios'][name]['throughput_rps']} req/s, "
+                f"p95 {report['scenarios'][name]['p95_ms']} ms",
+                file=sys.stderr
+            )
+        if not args.scenarios or args.page_depths != DEFAULT_PAGE_DEPTHS:
+            report["pagination"] = await measure_pagination(client, mongo.db, page_depths, args.page_requests)
+        if not args.scenarios:
+            report["suggestions_vs_regex"] = await measure_suggestions_vs_regex(
+                client, mongo.db, context, args.requests, in_process=not args.url
+            )
+            report["serialization"] = await measure_serialization(mongo.db)
+            if not args.url:
+                report["export_memory"] = await compare_export_memory()
+        if not args.url:
+            from restaurants import restaurant_cache
+            report["cache"] = restaurant_cache.stats()
+
+    timeout = httpx.Timeout(120.0)
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=timeout) as client:
+            await run_all(client)
+        mongo.close()
+    else:
+        app = create_app()
+        # O ASGITransport não dispara o lifespan; ele é aberto aqui
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=timeout) as client:
+                await run_all(client)
+
+    report["meta"]["finished_at"] = datetime.utcnow().isoformat()
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark e teste de carga da API de restaurantes")
+    parser.add_argument("--size", type=int, default=10000, help="Restaurantes sintéticos a gerar")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Documentos por insert_many no seed")
+    parser.add_argument("--seed", type=int, default=42, help="Semente do gerador (catálogo reprodutível)")
+    parser.add_argument("--skip-seed", action="store_true", help="Reaproveita o catálogo já gravado")
+    parser.add_argument("--db-name", default=os.environ.get("BENCHMARK_DB_NAME", "eco_benchmark"),
+                        help="Banco usado pelo benchmark (é apagado pelo seed)")
+    parser.add_argument("--requests", type=int, default=200, help="Requisições por cenário")
+    parser.add_argument("--export-requests", type=int, default=5, help="Requisições do cenário de exportação")
+    parser.add_argument("--concurrency", type=int, default=10, help="Requisições simultâneas")
+    parser.add_argument("--scenarios", help="Cenários separados por vírgula (padrão: todos)")
+    parser.add_argument("--url", help="URL de um servidor já rodando (padrão: app em processo)")
+    parser.add_argument("--cache-ttl", type=float, default=0.0,
+                        help="CACHE_TTL_SECONDS do app em processo (padrão 0: cache desligado na prática)")
+    parser.add_argument("--page-depths", default=DEFAULT_PAGE_DEPTHS, help="Páginas medidas por cursor e por skip")
+    parser.add_argument("--page-requests", type=int, default=50, help="Requisições por página medida")
+    parser.add_argument("--output", help="Arquivo JSON para gravar o resultado (padrão: saída padrão)")
+    parser.add_argument("--baseline", help="Resultado anterior para comparar")
+    parser.add_argument("--max-regression", type=float, default=20.0, help="Piora máxima aceita em %% (p95 e throughput)")
+    args = parser.parse_args()
+
+    if args.db_name == os.environ.get("DB_NAME") and not args.skip_seed:
+        raise SystemExit("--db-name é o banco da aplicação; use outro banco ou --skip-seed")
+    # Precisa valer antes de restaurants.py criar o cache
+    os.environ["CACHE_TTL_SECONDS"] = str(args.cache_ttl)
+
+    report = asyncio.run(run_benchmark(args))
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(output, encoding="utf-8")
+    else:
+        print(output)
+
+    regressions = check_invariants(report)
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        regressions += find_regressions(report, baseline, args.max_regression)
+    if regressions:
+        print("❌ Regressões acima do limite:", file=sys.stderr)
+        for regression in regressions:
+            print(f"   - {regression}", file=sys.stderr)
+        sys.exit(1)
+    if args.baseline:
+        print("✅ Sem regressões acima do limite", file=sys.stderr)
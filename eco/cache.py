@@ -0,0 +1,185 @@
+import json
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+class MemoryCache:
+    """Cache LRU em memória com expiração por TTL"""
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 60.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._counters: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    async def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self.evictions += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    async def set(self, key: str, value: Any):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def delete(self, *keys: str):
+        for key in keys:
+            self._entries.pop(key, None)
+
+    async def counter(self, key: str) -> int:
+        return self._counters.get(key, 0)
+
+    async def incr(self, key: str) -> int:
+        self._counters[key] = self._counters.get(key, 0) + 1
+        return self._counters[key]
+
+    async def clear(self):
+        self._entries.clear()
+        self._counters.clear()
+
+    def stats(self) -> dict:
+        return {
+            "backend": "memory",
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Tipo não serializável: {type(value).__name__}")
+
+class RedisCache:
+    """Cache em um servidor compatível com o protocolo Redis
+
+    Os valores são gravados como JSON com expiração (SETEX); as remoções por
+    memória cheia ficam a cargo do servidor e não entram no contador local.
+    """
+
+    def __init__(self, url: str, ttl: float = 60.0, prefix: str = "eco:restaurants:"):
+        try:
+            from redis import asyncio as aioredis
+        except ImportError:
+            raise RuntimeError("CACHE_BACKEND=redis requer o pacote 'redis'")
+
+        self.ttl = ttl
+        self.prefix = prefix
+        self._client = aioredis.from_url(url)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    async def get(self, key: str) -> Optional[Any]:
+        raw = await self._client.get(self.prefix + key)
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(raw)
+
+    async def set(self, key: str, value: Any):
+        await self._client.setex(
+            self.prefix + key,
+            max(1, int(self.ttl)),
+            json.dumps(value, default=_json_default)
+        )
+
+    async def delete(self, *keys: str):
+        if keys:
+            await self._client.delete(*(self.prefix + key for key in keys))
+
+    async def counter(self, key: str) -> int:
+        raw = await self._client.get(self.prefix + key)
+        return int(raw) if raw is not None else 0
+
+    async def incr(self, key: str) -> int:
+        return await self._client.incr(self.prefix + key)
+
+    async def clear(self):
+        keys = [key async for key in self._client.scan_iter(match=self.prefix + "*")]
+        if keys:
+            await self._client.delete(*keys)
+
+    def stats(self) -> dict:
+        return {
+            "backend": "redis",
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
+
+def create_cache_backend():
+    """Cria o backend configurado por CACHE_BACKEND (memory ou redis)"""
+    backend = os.environ.get("CACHE_BACKEND", "memory")
+    ttl = float(os.environ.get("CACHE_TTL_SECONDS", "60"))
+
+    if backend == "redis":
+        return RedisCache(os.environ.get("CACHE_URL", "redis://localhost:6379/0"), ttl=ttl)
+    if backend == "memory":
+        return MemoryCache(max_entries=int(os.environ.get("CACHE_MAX_ENTRIES", "1024")), ttl=ttl)
+    raise RuntimeError(f"CACHE_BACKEND desconhecido: {backend}")
+
+class RestaurantCache:
+    """Cache de leitura dos restaurantes com invalidação nas escritas
+
+    Documentos individuais são removidos pelo id. Listas são indexadas pela
+    tupla de filtros e por uma geração que é incrementada a cada escrita,
+    já que qualquer escrita pode mudar a composição ou a ordem de uma página;
+    entradas de gerações antigas deixam de ser lidas e saem por LRU/TTL.
+    """
+
+    GENERATION_KEY = "lists:generation"
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    @staticmethod
+    def _key(*parts) -> str:
+        return json.dumps(parts, default=str, separators=(",", ":"))
+
+    async def generation(self) -> int:
+        """Geração atual; deve ser lida antes de consultar o banco"""
+        return await self.backend.counter(self.GENERATION_KEY)
+
+    async def get_restaurant(self, restaurant_id: str) -> Optional[dict]:
+        return await self.backend.get(self._key("restaurant", restaurant_id))
+
+    async def set_restaurant(self, restaurant_id: str, restaurant: dict, generation: int):
+        # Não grava se houve escrita enquanto o documento era lido do banco
+        if await self.generation() == generation:
+            await self.backend.set(self._key("restaurant", restaurant_id), restaurant)
+
+    async def get_list(self, filters: tuple, generation: int) -> Optional[Any]:
+        return await self.backend.get(self._key("list", generation, *filters))
+
+    async def set_list(self, filters: tuple, generation: int, page: Any):
+        await self.backend.set(self._key("list", generation, *filters), page)
+
+    async def invalidate(self, *restaurant_ids: str):
+        """Remove os restaurantes do cache e invalida todas as listas"""
+        await self.backend.delete(*(self._key("restaurant", restaurant_id) for restaurant_id in restaurant_ids))
+        await self.backend.incr(self.GENERATION_KEY)
+
+    def stats(self) -> dict:
+        return self.backend.stats()
@@ -0,0 +1,182 @@
+import asyncio
+import logging
+from typing import AsyncIterator, Awaitable, Callable, List, Optional
+from pymongo.errors import OperationFailure, PyMongoError
+from database import mongo
+from responses import public_document
+
+logger = logging.getLogger(__name__)
+
+# Códigos do MongoDB: change stream fora de replica set e histórico (oplog) perdido
+NOT_A_REPLICA_SET = 40573
+CHANGE_STREAM_HISTORY_LOST = {280, 286}
+
+# Enviado ao assinante quando eventos foram descartados: ele deve recarregar a lista
+RESYNC_EVENT = {"type": "resync"}
+
+OPERATION_TYPES = {"insert": "created", "update": "updated", "replace": "updated", "delete": "deleted"}
+
+ChangeSource = Callable[[Optional[dict]], AsyncIterator[dict]]
+
+async def mongo_change_source(resume_token: Optional[dict]) -> AsyncIterator[dict]:
+    """Change stream da coleção restaurants, retomado a partir de `resume_token`
+
+    A imagem anterior (fullDocumentBeforeChange) só existe no MongoDB 6.0+ com
+    changeStreamPreAndPostImages habilitado (ver enable_pre_images).
+    """
+    options = {"full_document": "updateLookup"}
+    server_info = await mongo.client.server_info()
+    if server_info.get("versionArray", [0])[0] >= 6:
+        options["full_document_before_change"] = "whenAvailable"
+
+    async with mongo.db.restaurants.watch(resume_after=resume_token, **options) as stream:
+        async for change in stream:
+            yield change
+
+async def enable_pre_images(db):
+    """Liga as imagens anteriores na coleção, para que remoções tragam id e categorias"""
+    try:
+        await db.command({"collMod": "restaurants", "changeStreamPreAndPostImages": {"enabled": True}})
+    except PyMongoError as error:
+        logger.info("Imagens anteriores do change stream indisponíveis: %s", error)
+
+def change_event(change: dict) -> dict:
+    """Converte um evento do change stream no evento enviado aos clientes
+
+    Sem o documento (remoção sem imagem anterior) não se sabe qual restaurante
+    mudou; o evento vira um pedido de ressincronização.
+    """
+    event_type = OPERATION_TYPES.get(change.get("operationType"))
+    after = change.get("fullDocument")
+    before = change.get("fullDocumentBeforeChange")
+    document = after or before
+    if event_type is None or document is None:
+        return RESYNC_EVENT
+
+    categories = set((before or {}).get("categories") or []) | set((after or {}).get("categories") or [])
+    return {
+        "type": "deleted" if after is None else event_type,
+        "id": document["id"],
+        "categories": sorted(categories),
+        "restaurant": public_document(after) if after is not None else None
+    }
+
+class Subscription:
+    """Fila de eventos de um cliente, com limite de tamanho
+
+    Se o cliente não acompanha o ritmo, os eventos pendentes são descartados
+    e substituídos por um único pedido de ressincronização.
+    """
+
+    def __init__(self, categories: Optional[List[str]] = None, max_queued: int = 100):
+        self.categories = set(categories) if categories else None
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queued)
+        self.dropped = 0
+
+    def wants(self, event: dict) -> bool:
+        if self.categories is None or "categories" not in event:
+            return True
+        return bool(self.categories.intersection(event["categories"]))
+
+    def push(self, event: dict):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+                self.dropped += 1
+            self.queue.put_nowait(RESYNC_EVENT)
+
+    async def get(self, timeout: float) -> Optional[dict]:
+        """Próximo evento, ou None se nada chegou dentro do prazo"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+class ChangeFeed:
+    """Um único watcher do change stream repassado a vários assinantes
+
+    A fonte é injetável: qualquer função que receba o resume token e devolva
+    um iterador assíncrono de eventos no formato do change stream.
+    """
+
+    def __init__(self, source: ChangeSource = mongo_change_source, max_queued: int = 100, retry_seconds: float = 5.0):
+        self.source = source
+        self.max_queued = max_queued
+        self.retry_seconds = retry_seconds
+        self.resume_token: Optional[dict] = None
+        self.subscriptions: List[Subscription] = []
+        self.listeners: List[Callable[[dict], Awaitable[None]]] = []
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def add_listener(self, listener: Callable[[dict], Awaitable[None]]):
+        """Registra um callback chamado a cada evento (ex.: invalidar caches locais)"""
+        self.listeners.append(listener)
+
+    def subscribe(self, categories: Optional[List[str]] = None) -> Subscription:
+        subscription = Subscription(categories, self.max_queued)
+        self.subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        if subscription in self.subscriptions:
+            self.subscriptions.remove(subscription)
+
+    async def publish(self, event: dict):
+        for listener in self.listeners:
+            try:
+                await listener(event)
+            except Exception:
+                logger.exception("Falha ao processar evento do change stream")
+        for subscription in self.subscriptions:
+            if subscription.wants(event):
+                subscription.push(event)
+
+    async def _watch(self):
+        while True:
+            try:
+                async for change in self.source(self.resume_token):
+                    await self.publish(change_event(change))
+                    self.resume_token = change.get("_id")
+                # O stream só termina sozinho quando é invalidado (coleção
+                # apagada ou renomeada): não há como retomar, recomeça do zero
+                self.resume_token = None
+                await self.publish(RESYNC_EVENT)
+            except OperationFailure as error:
+                if error.code == NOT_A_REPLICA_SET:
+                    logger.warning("Change stream desativado: o MongoDB não é um replica set")
+                    return
+                if error.code in CHANGE_STREAM_HISTORY_LOST:
+                    # Não dá para retomar do ponto anterior; os clientes recarregam
+                    self.resume_token = None
+                    await self.publish(RESYNC_EVENT)
+                else:
+                    logger.warning("Erro no change stream: %s", error)
+            except PyMongoError as error:
+                logger.warning("Erro no change stream: %s", error)
+            await asyncio.sleep(self.retry_seconds)
+
+    def start(self):
+        if not self.running:
+            self._task = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "subscribers": len(self.subscriptions),
+            "dropped_events": sum(subscription.dropped for subscription in self.subscriptions)
+        }
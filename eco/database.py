@@ -0,0 +1,235 @@
+import asyncio
+import os
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import List, Optional
+from fastapi import APIRouter, HTTPException
+from motor.motor_asyncio import AsyncIOMotorClient
+from pydantic import BaseModel
+from pymongo import ReadPreference, monitoring
+
+class MongoSettings(BaseModel):
+    """Configuração da conexão com o MongoDB, lida das variáveis de ambiente"""
+    url: str
+    db_name: str
+    max_pool_size: int = 100
+    min_pool_size: int = 0
+    max_idle_time_ms: Optional[int] = None
+    wait_queue_timeout_ms: Optional[int] = None
+    server_selection_timeout_ms: int = 5000
+    connect_timeout_ms: int = 10000
+    socket_timeout_ms: Optional[int] = None
+    compressors: List[str] = []
+    read_from_secondaries: bool = False
+
+    @classmethod
+    def from_env(cls) -> "MongoSettings":
+        def optional_int(name: str) -> Optional[int]:
+            value = os.environ.get(name)
+            return int(value) if value else None
+
+        return cls(
+            url=os.environ["MONGO_URL"],
+            db_name=os.environ["DB_NAME"],
+            max_pool_size=int(os.environ.get("MONGO_MAX_POOL_SIZE", "100")),
+            min_pool_size=int(os.environ.get("MONGO_MIN_POOL_SIZE", "0")),
+            max_idle_time_ms=optional_int("MONGO_MAX_IDLE_TIME_MS"),
+            wait_queue_timeout_ms=optional_int("MONGO_WAIT_QUEUE_TIMEOUT_MS"),
+            server_selection_timeout_ms=int(os.environ.get("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000")),
+            connect_timeout_ms=int(os.environ.get("MONGO_CONNECT_TIMEOUT_MS", "10000")),
+            socket_timeout_ms=optional_int("MONGO_SOCKET_TIMEOUT_MS"),
+            compressors=[c.strip() for c in os.environ.get("MONGO_COMPRESSORS", "").split(",") if c.strip()],
+            read_from_secondaries=os.environ.get("MONGO_READ_SECONDARY", "false").lower() in ("1", "true", "yes")
+        )
+
+    def client_options(self) -> dict:
+        options = {
+            "maxPoolSize": self.max_pool_size,
+            "minPoolSize": self.min_pool_size,
+            "serverSelectionTimeoutMS": self.server_selection_timeout_ms,
+            "connectTimeoutMS": self.connect_timeout_ms
+        }
+        if self.max_idle_time_ms is not None:
+            options["maxIdleTimeMS"] = self.max_idle_time_ms
+        if self.wait_queue_timeout_ms is not None:
+            options["waitQueueTimeoutMS"] = self.wait_queue_timeout_ms
+        if self.socket_timeout_ms is not None:
+            options["socketTimeoutMS"] = self.socket_timeout_ms
+        if self.compressors:
+            options["compressors"] = ",".join(self.compressors)
+        return options
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """Contadores do pool de conexões (conexões em uso e tempo de espera)
+
+    Os eventos chegam nas threads do Motor, por isso o acesso é protegido.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.open_connections = 0
+        self.checked_out = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def _record_wait(self, event):
+        started = getattr(self._local, "checkout_started", None)
+        self._local.checkout_started = None
+        wait = getattr(event, "duration", None)
+        if wait is None:
+            wait = time.perf_counter() - started if started is not None else 0.0
+        self.wait_seconds_total += wait
+        self.wait_seconds_max = max(self.wait_seconds_max, wait)
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open_connections += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open_connections -= 1
+
+    def connection_check_out_started(self, event):
+        self._local.checkout_started = time.perf_counter()
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.checkout_failures += 1
+            self._record_wait(event)
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            self.checked_out += 1
+            self.checkouts += 1
+            self._record_wait(event)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out -= 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "open_connections": self.open_connections,
+                "checked_out": self.checked_out,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "wait_seconds_total": round(self.wait_seconds_total, 6),
+                "wait_seconds_max": round(self.wait_seconds_max, 6),
+                "wait_seconds_avg": round(self.wait_seconds_total / self.checkouts, 6) if self.checkouts else 0.0
+            }
+
+class Database:
+    """Cliente do MongoDB com ciclo de vida explícito (connect/close)"""
+
+    def __init__(self):
+        self.settings: Optional[MongoSettings] = None
+        self.pool_metrics = PoolMetrics()
+        self.event_listeners: list = [self.pool_metrics]
+        self._client: Optional[AsyncIOMotorClient] = None
+        self._db = None
+        self._read_db = None
+
+    @property
+    def connected(self) -> bool:
+        return self._client is not None
+
+    def connect(self, settings: Optional[MongoSettings] = None):
+        """Abre o cliente; chamadas repetidas reaproveitam a conexão existente"""
+        if self._client is not None:
+            return
+
+        self.settings = settings or MongoSettings.from_env()
+        self._client = AsyncIOMotorClient(
+            self.settings.url,
+            event_listeners=self.event_listeners,
+            **self.settings.client_options()
+        )
+        self._db = self._client[self.settings.db_name]
+        self._read_db = (
+            self._client.get_database(self.settings.db_name, read_preference=ReadPreference.SECONDARY_PREFERRED)
+            if self.settings.read_from_secondaries else self._db
+        )
+
+    def close(self):
+        if self._client is not None:
+            self._client.close()
+        self._client = None
+        self._db = None
+        self._read_db = None
+
+    @property
+    def client(self) -> AsyncIOMotorClient:
+        if self._client is None:
+            raise RuntimeError("Banco de dados não conectado")
+        return self._client
+
+    @property
+    def db(self):
+        """Banco para escritas e leituras que precisam ver a última escrita"""
+        if self._db is None:
+            raise RuntimeError("Banco de dados não conectado")
+        return self._db
+
+    @property
+    def read_db(self):
+        """Banco para listagens e buscas; usa secundários com MONGO_READ_SECONDARY"""
+        if self._read_db is None:
+            raise RuntimeError("Banco de dados não conectado")
+        return self._read_db
+
+    async def ping(self, timeout: float = 2.0) -> bool:
+        try:
+            await asyncio.wait_for(self.db.command("ping"), timeout)
+        except Exception:
+            return False
+        return True
+
+mongo = Database()
+
+@asynccontextmanager
+async def lifespan(app):
+    """Lifespan do FastAPI: abre o cliente antes dos handlers de startup e fecha no fim"""
+    mongo.connect()
+    await app.router.startup()
+    try:
+        yield
+    finally:
+        await app.router.shutdown()
+        mongo.close()
+
+router = APIRouter(prefix="/health", tags=["health"])
+
+@router.get("/ready")
+async def readiness():
+    """Prova de prontidão: responde 503 enquanto o MongoDB não responde ao ping"""
+    if not mongo.connected or not await mongo.ping():
+        raise HTTPException(status_code=503, detail="Banco de dados indisponível")
+    return {"status": "ready"}
+
+@router.get("/pool")
+async def pool_metrics():
+    """Métricas do pool de conexões com o MongoDB"""
+    return {
+        "max_pool_size": mongo.settings.max_pool_size if mongo.settings else None,
+        **mongo.pool_metrics.snapshot()
+    }
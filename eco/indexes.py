@@ -0,0 +1,63 @@
+import asyncio
+import logging
+from pymongo import ASCENDING, GEOSPHERE, TEXT, IndexModel
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+TEXT_INDEX_LANGUAGE = "portuguese"
+
+# Índices compostos seguem a regra igualdade -> ordenação -> faixa, com a
+# ordenação (name, id) usada pela listagem e pela paginação por cursor
+RESTAURANT_INDEXES = [
+    IndexModel([("name", ASCENDING), ("id", ASCENDING)]),
+    IndexModel([("categories", ASCENDING), ("name", ASCENDING), ("id", ASCENDING), ("rating", ASCENDING)]),
+    IndexModel([("hasPool", ASCENDING), ("name", ASCENDING), ("id", ASCENDING)]),
+    IndexModel([("rating", ASCENDING)]),
+    IndexModel([("updated_at", ASCENDING)]),
+    IndexModel([("geo", GEOSPHERE)]),
+    IndexModel(
+        [("name", TEXT), ("location", TEXT), ("cuisine", TEXT)],
+        default_language=TEXT_INDEX_LANGUAGE
+    )
+]
+
+# Índices únicos são criados um a um para que dados antigos com valores
+# repetidos não impeçam a criação dos demais. Os nomes são os padrões do
+# MongoDB, para coincidir com índices já criados pelo seeder.
+UNIQUE_RESTAURANT_INDEXES = [
+    IndexModel([("id", ASCENDING)], unique=True),
+    IndexModel([("name_key", ASCENDING)], unique=True)
+]
+
+async def _drop_outdated_text_index(collection):
+    """Remove um índice de texto criado com outro idioma (só pode haver um por coleção)"""
+    indexes = await collection.index_information()
+    for name, info in indexes.items():
+        is_text = any(kind == TEXT for _, kind in info["key"])
+        if is_text and info.get("default_language", "english") != TEXT_INDEX_LANGUAGE:
+            logger.info("Removendo índice de texto desatualizado %s", name)
+            await collection.drop_index(name)
+
+async def _create_unique_index(collection, index: IndexModel):
+    try:
+        await collection.create_indexes([index])
+    except DuplicateKeyError as error:
+        logger.error(
+            "Não foi possível criar o índice %s: %s. "
+            "Rode `python seet_data.py --migrate-name-keys` e corrija os valores repetidos.",
+            index.document["name"], error
+        )
+
+async def ensure_indexes(db):
+    """Cria (se necessário) todos os índices usados pela API de restaurantes
+
+    Os comandos de criação são enviados em paralelo.
+    """
+    collection = db.restaurants
+
+    await _drop_outdated_text_index(collection)
+    await asyncio.gather(
+        collection.create_indexes(RESTAURANT_INDEXES),
+        *(_create_unique_index(collection, index) for index in UNIQUE_RESTAURANT_INDEXES)
+    )
@@ -0,0 +1,329 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, Optional, Tuple
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from pymongo import monitoring
+from database import mongo
+
+logger = logging.getLogger("eco.slow_queries")
+
+# Limites (em segundos) dos buckets dos histogramas de latência
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Comandos de leitura que podem ser analisados com explain
+EXPLAINABLE_COMMANDS = {"find", "aggregate", "count", "distinct"}
+
+def _escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                yield f"{self.name}{_format_labels(self.labels, label_values)} {value}"
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self._series: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values):
+        with self._lock:
+            series = self._series.setdefault(label_values, [[0] * len(self.buckets), 0.0, 0])
+            position = bisect_left(self.buckets, value)
+            if position < len(self.buckets):
+                series[0][position] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            for label_values, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    labels = _format_labels(self.labels, label_values, f'le="{bound}"')
+                    yield f"{self.name}_bucket{labels} {cumulative}"
+                labels = _format_labels(self.labels, label_values, 'le="+Inf"')
+                yield f"{self.name}_bucket{labels} {count}"
+                yield f"{self.name}_sum{_format_labels(self.labels, label_values)} {total}"
+                yield f"{self.name}_count{_format_labels(self.labels, label_values)} {count}"
+
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "Duração das requisições HTTP", ("method", "route", "status")
+)
+mongo_command_duration = Histogram(
+    "mongodb_command_duration_seconds", "Duração dos comandos enviados ao MongoDB", ("command", "collection")
+)
+mongo_command_failures = Counter(
+    "mongodb_command_failures_total", "Comandos do MongoDB que falharam", ("command", "collection")
+)
+mongo_documents_returned = Counter(
+    "mongodb_documents_returned_total", "Documentos retornados na primeira leva das consultas", ("command", "collection")
+)
+mongo_slow_queries = Counter(
+    "mongodb_slow_queries_total", "Consultas acima de SLOW_QUERY_MS", ("command", "collection")
+)
+mongo_documents_examined = Counter(
+    "mongodb_slow_query_documents_examined_total", "Documentos examinados pelas consultas lentas (explain)", ("collection",)
+)
+mongo_collection_scans = Counter(
+    "mongodb_slow_query_collection_scans_total", "Consultas lentas executadas sem índice (COLLSCAN)", ("collection",)
+)
+
+METRICS = [
+    http_request_duration,
+    mongo_command_duration,
+    mongo_command_failures,
+    mongo_documents_returned,
+    mongo_slow_queries,
+    mongo_documents_examined,
+    mongo_collection_scans
+]
+
+def _plan_stages(plan: dict):
+    """Percorre a árvore do plano de execução devolvendo o nome de cada estágio"""
+    if not isinstance(plan, dict):
+        return
+    if "stage" in plan:
+        yield plan["stage"]
+    for key in ("inputStage", "queryPlan"):
+        yield from _plan_stages(plan.get(key))
+    for child in plan.get("inputStages", []):
+        yield from _plan_stages(child)
+
+def _shape(value) -> str:
+    """Estrutura de um filtro sem os valores ({"a": 1} e {"a": 2} têm o mesmo formato)"""
+    if isinstance(value, dict):
+        return "{" + ",".join(f"{key}:{_shape(item)}" for key, item in sorted(value.items())) + "}"
+    if isinstance(value, (list, tuple)):
+        return "[" + (_shape(value[0]) if value else "") + "]"
+    return "?"
+
+def query_shape(command_name: str, command: dict) -> str:
+    """Formato da consulta, usado para limitar os explains de consultas parecidas"""
+    if command_name == "aggregate":
+        return "|".join(_shape(stage) for stage in command.get("pipeline", []))
+    return _shape({key: command.get(key) for key in ("filter", "query", "sort", "key") if key in command})
+
+def _find_execution_stats(explain: dict) -> Optional[dict]:
+    """Localiza executionStats na saída do explain (find ou primeiro estágio do aggregate)"""
+    if "executionStats" in explain:
+        return explain["executionStats"]
+    for stage in explain.get("stages", []):
+        cursor = stage.get("$cursor")
+        if cursor and "executionStats" in cursor:
+            return cursor["executionStats"]
+    return None
+
+class QueryMonitor(monitoring.CommandListener):
+    """Registra duração, documentos retornados e consultas lentas de cada comando
+
+    Documentos examinados e uso de índice só são conhecidos via explain, que é
+    executado em segundo plano apenas para as consultas acima do limite. O
+    explain roda a consulta de novo, por isso cada formato de consulta
+    (coleção, comando e estrutura do filtro) é analisado no máximo uma vez a
+    cada `explain_interval` segundos.
+    """
+
+    def __init__(self, slow_query_ms: float = 100, explain_slow_queries: bool = True, explain_interval: float = 300):
+        self.slow_query_ms = slow_query_ms
+        self.explain_slow_queries = explain_slow_queries
+        self.explain_interval = explain_interval
+        self._last_explained: Dict[tuple, float] = {}
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending: Dict[tuple, tuple] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "QueryMonitor":
+        return cls(
+            slow_query_ms=float(os.environ.get("SLOW_QUERY_MS", "100")),
+            explain_slow_queries=os.environ.get("SLOW_QUERY_EXPLAIN", "true").lower() in ("1", "true", "yes"),
+            explain_interval=float(os.environ.get("SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS", "300"))
+        )
+
+    def _should_explain(self, collection: str, command_name: str, command: dict) -> bool:
+        key = (collection, command_name, query_shape(command_name, command))
+        now = time.monotonic()
+        with self._lock:
+            last = self._last_explained.get(key)
+            if last is not None and now - last < self.explain_interval:
+                return False
+            self._last_explained[key] = now
+            return True
+
+    @staticmethod
+    def _key(event) -> tuple:
+        return (event.request_id, event.connection_id)
+
+    def started(self, event):
+        command = event.command
+        collection = command.get(event.command_name)
+        if not isinstance(collection, str):
+            collection = ""
+        explainable = None
+        if event.command_name in EXPLAINABLE_COMMANDS:
+            explainable = {k: v for k, v in command.items() if not k.startswith("$") and k not in ("lsid", "txnNumber")}
+        with self._lock:
+            self._pending[self._key(event)] = (collection, event.database_name, explainable)
+
+    def succeeded(self, event):
+        with self._lock:
+            collection, database_name, explainable = self._pending.pop(self._key(event), ("", None, None))
+        duration = event.duration_micros / 1_000_000
+        mongo_command_duration.observe(duration, event.command_name, collection)
+
+        reply = event.reply
+        if "cursor" in reply:
+            returned = len(reply["cursor"].get("firstBatch", reply["cursor"].get("nextBatch", [])))
+            mongo_documents_returned.inc(event.command_name, collection, amount=returned)
+
+        if duration * 1000 >= self.slow_query_ms and event.command_name != "explain":
+            mongo_slow_queries.inc(event.command_name, collection)
+            logger.warning(
+                "Consulta lenta: %s em %s.%s levou %.1f ms",
+                event.command_name, database_name, collection, duration * 1000
+            )
+            if (
+                self.explain_slow_queries
+                and explainable is not None
+                and self.loop is not None
+                and self._should_explain(collection, event.command_name, explainable)
+            ):
+                self.loop.call_soon_threadsafe(
+                    lambda: asyncio.ensure_future(self._explain(database_name, collection, explainable))
+                )
+
+    def failed(self, event):
+        with self._lock:
+            collection, _, _ = self._pending.pop(self._key(event), ("", None, None))
+        mongo_command_failures.inc(event.command_name, collection)
+
+    async def _explain(self, database_name: str, collection: str, command: dict):
+        try:
+            explain = await mongo.client[database_name].command({"explain": command, "verbosity": "executionStats"})
+        except Exception as error:
+            logger.info("Não foi possível executar explain em %s: %s", collection, error)
+            return
+
+        stats = _find_execution_stats(explain)
+        if stats is None:
+            return
+        stages = set(_plan_stages(stats.get("executionStages", {})))
+        examined = stats.get("totalDocsExamined", 0)
+        mongo_documents_examined.inc(collection, amount=examined)
+        if "COLLSCAN" in stages:
+            mongo_collection_scans.inc(collection)
+
+        logger.warning(
+            "Explain da consulta lenta em %s: %s documentos examinados, %s retornados, índice %s; filtro=%s",
+            collection, examined, stats.get("nReturned"),
+            "não usado (COLLSCAN)" if "COLLSCAN" in stages else "usado",
+            command.get("filter", command.get("pipeline"))
+        )
+
+query_monitor = QueryMonitor.from_env()
+
+class RequestTimingMiddleware:
+    """Middleware ASGI que mede a duração de cada requisição por rota"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            http_request_duration.observe(
+                time.perf_counter() - started,
+                scope["method"],
+                route.path if route is not None else "não-encontrada",
+                str(status["code"])
+            )
+
+def render_metrics() -> str:
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+
+    pool = mongo.pool_metrics.snapshot()
+    lines.append("# HELP mongodb_pool_checked_out_connections Conexões do pool em uso")
+    lines.append("# TYPE mongodb_pool_checked_out_connections gauge")
+    lines.append(f"mongodb_pool_checked_out_connections {pool['checked_out']}")
+    lines.append("# HELP mongodb_pool_open_connections Conexões abertas no pool")
+    lines.append("# TYPE mongodb_pool_open_connections gauge")
+    lines.append(f"mongodb_pool_open_connections {pool['open_connections']}")
+    lines.append("# HELP mongodb_pool_checkout_wait_seconds_total Tempo total de espera por conexão")
+    lines.append("# TYPE mongodb_pool_checkout_wait_seconds_total counter")
+    lines.append(f"mongodb_pool_checkout_wait_seconds_total {pool['wait_seconds_total']}")
+    lines.append("# HELP mongodb_pool_checkouts_total Conexões retiradas do pool")
+    lines.append("# TYPE mongodb_pool_checkouts_total counter")
+    lines.append(f"mongodb_pool_checkouts_total {pool['checkouts']}")
+    return "\n".join(lines) + "\n"
+
+router = APIRouter(tags=["metrics"])
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Métricas no formato de texto do Prometheus"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+def install(app):
+    """Liga a instrumentação ao app: middleware, /metrics e monitoramento do Motor
+
+    Deve ser chamado antes da abertura do cliente (mongo.connect), já que os
+    listeners do pymongo são fixados na criação do cliente.
+    """
+    if query_monitor not in mongo.event_listeners:
+        mongo.event_listeners.append(query_monitor)
+    app.add_middleware(RequestTimingMiddleware)
+    app.include_router(router)
+
+    async def capture_loop():
+        query_monitor.loop = asyncio.get_running_loop()
+
+    app.add_event_handler("startup", capture_loop)
@@ -0,0 +1,99 @@
+import hashlib
+import json
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, List, Optional
+from fastapi.responses import JSONResponse
+from models.restaurant import Restaurant
+
+try:
+    import orjson
+except ImportError:  # orjson é opcional; sem ele usamos o json da biblioteca padrão
+    orjson = None
+
+# Campos públicos do restaurante e seus valores padrão, na ordem do modelo
+PUBLIC_FIELDS = [(name, field.default) for name, field in Restaurant.__fields__.items()]
+
+def json_default(value):
+    """Serializa datas no formato ISO 8601"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Tipo não serializável: {type(value).__name__}")
+
+def dumps(content: Any) -> bytes:
+    """Serializa para JSON em UTF-8, com orjson quando disponível"""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, default=json_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def public_document(restaurant: dict, fields: Optional[List[str]] = None) -> dict:
+    """Converte um documento armazenado na saída pública, sem revalidar
+
+    Os documentos já foram validados pelo modelo ao serem gravados; aqui só
+    removemos campos internos (_id, name_key, score) e preenchemos padrões.
+    A distância calculada pela busca por proximidade é mantida.
+    """
+    if fields is not None:
+        document = {field: restaurant[field] for field in fields if field in restaurant}
+    else:
+        document = {name: restaurant.get(name, default) for name, default in PUBLIC_FIELDS}
+
+    if "distance_km" in restaurant:
+        document["distance_km"] = round(restaurant["distance_km"], 2)
+    return document
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Verifica se o cabeçalho If-None-Match do cliente contém a ETag atual
+
+    If-None-Match usa comparação fraca: o prefixo W/ é ignorado.
+    """
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip().removeprefix("W/") for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+def as_utc(value) -> Optional[datetime]:
+    """Normaliza datas do banco (sem fuso, em UTC) ou do cache (texto ISO 8601) para UTC"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+def make_etag(*parts) -> str:
+    """ETag forte a partir das partes que determinam a representação"""
+    return '"' + hashlib.sha1("|".join(str(part) for part in parts).encode("utf-8")).hexdigest() + '"'
+
+def validator_headers(etag: str, last_modified: Optional[datetime], cache_control: str) -> dict:
+    """Cabeçalhos ETag, Last-Modified e Cache-Control, enviados tanto no 200 quanto no 304"""
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(as_utc(last_modified).replace(microsecond=0), usegmt=True)
+    return headers
+
+def not_modified(request_headers, etag: str, last_modified: Optional[datetime]) -> bool:
+    """Decide se a requisição condicional pode ser respondida com 304
+
+    If-None-Match tem precedência; If-Modified-Since só é considerado sem ele.
+    """
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match:
+        return etag_matches(if_none_match, etag)
+
+    if_modified_since = request_headers.get("if-modified-since")
+    if not if_modified_since or last_modified is None:
+        return False
+    try:
+        since = as_utc(parsedate_to_datetime(if_modified_since))
+    except (TypeError, ValueError):
+        return False
+    # Last-Modified tem resolução de segundos
+    return as_utc(last_modified).replace(microsecond=0) <= since
+
+class FastJSONResponse(JSONResponse):
+    """Resposta JSON que dispensa o response_model e o jsonable_encoder"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -1,12 +1,62 @@
 from pydantic import BaseModel, Field, validator
 from typing import List, Optional
 from datetime import datetime
+import unicodedata
 import uuid
 
+def fold_text(value: str) -> str:
+    """Normaliza texto para comparação: sem acentos e sem diferença de caixa"""
+    decomposed = unicodedata.normalize("NFKD", value)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+def name_key(name: str) -> str:
+    """Chave normalizada do nome, usada no índice único `name_key`"""
+    return " ".join(fold_text(name).split())
+
+# Categories data
+CATEGORIES = [
+    {"id": "all", "name": "Todos"},
+    {"id": "restaurants", "name": "Restaurantes"},
+    {"id": "piscina", "name": "Piscina"},
+    {"id": "rio-guama", "name": "Rio Guamá"},
+    {"id": "igarape-combu", "name": "Igarapé do Combu"},
+    {"id": "hospedagem", "name": "Com Hospedagem"},
+    {"id": "furo-paciencia", "name": "Furo da Paciência"},
+    {"id": "furo-sao-benedito", "name": "Furo do São Benedito"},
+    {"id": "piriquitaquara", "name": "Ig. do Piriquitaquara"}
+]
+
+# Registro de categorias por id, para validação em O(1); "all" só existe
+# como filtro e não pode ser gravado em um restaurante
+ALL_CATEGORIES = "all"
+CATEGORIES_BY_ID = {category["id"]: category for category in CATEGORIES}
+
+def check_category_ids(category_ids: List[str]) -> List[str]:
+    """Garante que a lista não é vazia e só contém categorias registradas"""
+    if not category_ids:
+        raise ValueError('Pelo menos uma categoria deve ser fornecida')
+    unknown = [c for c in category_ids if c not in CATEGORIES_BY_ID or c == ALL_CATEGORIES]
+    if unknown:
+        raise ValueError(f'Categorias desconhecidas: {", ".join(unknown)}')
+    return category_ids
+
 class Category(BaseModel):
     id: str
     name: str
 
+class GeoPoint(BaseModel):
+    type: str = Field("Point", regex="^Point$")
+    coordinates: List[float] = Field(..., description="[longitude, latitude]")
+    
+    @validator('coordinates')
+    def validate_coordinates(cls, v):
+        if len(v) != 2:
+            raise ValueError('As coordenadas devem ser [longitude, latitude]')
+        lng, lat = v
+        if not -180 <= lng <= 180 or not -90 <= lat <= 90:
+            raise ValueError('Coordenadas fora do intervalo válido')
+        return v
+
 class Restaurant(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     name: str = Field(..., min_length=1, max_length=200)
@@ -18,6 +68,7 @@ class Restaurant(BaseModel):
     email: Optional[str] = Field(None, description="Email de contato")
     categories: List[str] = Field(..., description="Lista de IDs de categorias")
     location: str = Field(..., description="Localização do restaurante")
+    geo: Optional[GeoPoint] = Field(None, description="Ponto GeoJSON da localização")
     comments: str = Field(default="Nenhum comentário")
     rating: Optional[float] = Field(None, ge=0, le=5, description="Avaliação de 0 a 5")
     cuisine: Optional[str] = Field(None, description="Tipo de culinária")
@@ -46,9 +97,14 @@ class RestaurantCreate(BaseModel):
     email: Optional[str] = None
     categories: List[str]
     location: str
+    geo: Optional[GeoPoint] = None
     comments: str = "Nenhum comentário"
     rating: Optional[float] = Field(None, ge=0, le=5)
     cuisine: Optional[str] = None
+    
+    @validator('categories')
+    def validate_categories(cls, v):
+        return check_category_ids(v)
 
 class RestaurantUpdate(BaseModel):
     name: Optional[str] = Field(None, min_length=1, max_length=200)
@@ -60,14 +116,29 @@ class RestaurantUpdate(BaseModel):
     email: Optional[str] = None
     categories: Optional[List[str]] = None
     location: Optional[str] = None
+    geo: Optional[GeoPoint] = None
     comments: Optional[str] = None
     rating: Optional[float] = Field(None, ge=0, le=5)
     cuisine: Optional[str] = None
     updated_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    @validator('categories')
+    def validate_categories(cls, v):
+        return check_category_ids(v) if v is not None else v
+
+class RestaurantBulkUpdate(RestaurantUpdate):
+    id: str
 
 class RestaurantSearch(BaseModel):
     search: Optional[str] = None
-    category: Optional[str] = None
+    search_mode: str = "text"
+    search_fallback: bool = True
+    categories: Optional[List[str]] = None
+    category_mode: str = "any"
     hasPool: Optional[bool] = None
     rating_min: Optional[float] = Field(None, ge=0, le=5)
-    rating_max: Optional[float] = Field(None, ge=0, le=5)
\ No newline at end of file
+    rating_max: Optional[float] = Field(None, ge=0, le=5)
+    near_lat: Optional[float] = Field(None, ge=-90, le=90)
+    near_lng: Optional[float] = Field(None, ge=-180, le=180)
+    max_km: Optional[float] = Field(None, gt=0)
+    changed_since: Optional[datetime] = None
\ No newline at end of file
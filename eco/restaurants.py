@@ -1,184 +1,977 @@
-from fastapi import APIRouter, HTTPException, Query, Depends
-from typing import List, Optional
-from models.restaurant import Restaurant, RestaurantCreate, RestaurantUpdate, RestaurantSearch, Category
+from fastapi import APIRouter, HTTPException, Query, Depends, Body, Request, Response
+from fastapi.responses import StreamingResponse
+from typing import List, Optional, Tuple
+from models.restaurant import (
+    Restaurant, RestaurantCreate, RestaurantUpdate, RestaurantBulkUpdate, RestaurantSearch, Category,
+    ALL_CATEGORIES, CATEGORIES, CATEGORIES_BY_ID, name_key
+)
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import DeleteOne, InsertOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 import os
 from datetime import datetime
+import base64
+import csv
+import hashlib
+import io
+import json
 import re
+from search_index import NameIndex
+from cache import RestaurantCache, create_cache_backend
+from stats import apply_stats_delta, get_list_version, get_overview, rebuild_stats, stats_delta
+from indexes import ensure_indexes
+from changefeed import ChangeFeed, enable_pre_images
+from responses import (
+    FastJSONResponse, as_utc, dumps, etag_matches, make_etag, not_modified, public_document, validator_headers
+)
 
 router = APIRouter(prefix="/restaurants", tags=["restaurants"])
 
 # MongoDB connection
-from server import db
-
-# Categories data
-CATEGORIES = [
-    {"id": "all", "name": "Todos"},
-    {"id": "restaurants", "name": "Restaurantes"},
-    {"id": "piscina", "name": "Piscina"},
-    {"id": "rio-guama", "name": "Rio Guamá"},
-    {"id": "igarape-combu", "name": "Igarapé do Combu"},
-    {"id": "hospedagem", "name": "Com Hospedagem"},
-    {"id": "furo-paciencia", "name": "Furo da Paciência"},
-    {"id": "furo-sao-benedito", "name": "Furo do São Benedito"},
-    {"id": "piriquitaquara", "name": "Ig. do Piriquitaquara"}
-]
+from database import mongo
+
+# Índice em memória usado pelo autocompletar
+name_index = NameIndex()
+
+# Cache de leitura (memória por padrão, ver CACHE_BACKEND)
+restaurant_cache = RestaurantCache(create_cache_backend())
+
+# Change stream compartilhado pelos clientes de /stream (requer replica set)
+change_feed = ChangeFeed(max_queued=int(os.environ.get("CHANGE_FEED_QUEUE_SIZE", "100")))
+CHANGE_FEED_ENABLED = os.environ.get("CHANGE_FEED_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Intervalo dos comentários de keep-alive enviados no /stream
+STREAM_HEARTBEAT_SECONDS = 15
+
+# As categorias só mudam com deploy: ETag calculada uma vez
+CATEGORIES_ETAG = '"' + hashlib.sha1(json.dumps(CATEGORIES, sort_keys=True).encode("utf-8")).hexdigest() + '"'
+CATEGORIES_CACHE_CONTROL = "public, max-age=3600"
+
+# Restaurantes mudam a qualquer momento: o cliente guarda, mas revalida (ETag/Last-Modified)
+RESTAURANTS_CACHE_CONTROL = "no-cache"
+
+# Código de erro do MongoDB para violação de índice único
+DUPLICATE_KEY_ERROR = 11000
+
+# Campos que não podem ser apagados (null) em uma atualização parcial
+NON_NULLABLE_FIELDS = {"name", "image", "hasPool", "hours", "phones", "categories", "location", "comments"}
+
+# Quantidade máxima de itens por requisição em lote
+BULK_MAX_ITEMS = 1000
+
+# Campos que podem ser pedidos em `fields=`
+PROJECTABLE_FIELDS = set(Restaurant.__fields__)
+
+# Colunas da exportação em CSV quando `fields` não é informado
+EXPORT_COLUMNS = list(Restaurant.__fields__)
+
+# Limites das faixas de avaliação em `facets=rating_bucket` (o último inclui 5)
+RATING_BUCKETS = [0, 1, 2, 3, 4, 5.01]
+
+# Sub-pipelines de contagem disponíveis em `facets=`
+FACET_PIPELINES = {
+    "categories": [
+        {"$unwind": "$categories"},
+        {"$match": {"categories": {"$in": [c for c in CATEGORIES_BY_ID if c != ALL_CATEGORIES]}}},
+        {"$group": {"_id": "$categories", "count": {"$sum": 1}}}
+    ],
+    "hasPool": [
+        {"$group": {"_id": "$hasPool", "count": {"$sum": 1}}}
+    ],
+    "rating_bucket": [
+        {"$bucket": {
+            "groupBy": "$rating",
+            "boundaries": RATING_BUCKETS,
+            "default": "sem-avaliacao",
+            "output": {"count": {"$sum": 1}}
+        }}
+    ]
+}
+
+# Ordenação estável usada pela paginação por cursor
+LIST_SORT = [("name", 1), ("id", 1)]
+
+def encode_cursor(name: str, restaurant_id: str) -> str:
+    """Gera um cursor opaco a partir do último par (name, id) da página"""
+    raw = json.dumps([name, restaurant_id], ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """Decodifica um cursor gerado por encode_cursor"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        name, restaurant_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, TypeError, UnicodeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    if not isinstance(name, str) or not isinstance(restaurant_id, str):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    return name, restaurant_id
+
+def cursor_filter(cursor: str) -> dict:
+    """Converte o cursor em uma consulta por faixa sobre o índice (name, id)"""
+    name, restaurant_id = decode_cursor(cursor)
+    return {"$or": [
+        {"name": {"$gt": name}},
+        {"name": name, "id": {"$gt": restaurant_id}}
+    ]}
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """Valida a lista `fields=a,b,c`; `id` sempre é incluído"""
+    if not fields:
+        return None
+    
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = sorted(set(requested) - PROJECTABLE_FIELDS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Campos desconhecidos: {', '.join(unknown)}")
+    
+    return sorted(set(requested) | {"id"})
+
+def build_filters(params: RestaurantSearch) -> dict:
+    """Monta o filtro do MongoDB para os filtros de listagem (exceto a busca por texto)"""
+    filters = {}
+    
+    if params.categories:
+        if len(params.categories) == 1:
+            filters["categories"] = params.categories[0]
+        elif params.category_mode == "all":
+            filters["categories"] = {"$all": params.categories}
+        else:
+            filters["categories"] = {"$in": params.categories}
+    
+    if params.hasPool is not None:
+        filters["hasPool"] = params.hasPool
+    
+    if params.rating_min is not None or params.rating_max is not None:
+        rating_filter = {}
+        if params.rating_min is not None:
+            rating_filter["$gte"] = params.rating_min
+        if params.rating_max is not None:
+            rating_filter["$lte"] = params.rating_max
+        filters["rating"] = rating_filter
+    
+    if params.changed_since is not None:
+        filters["updated_at"] = {"$gt": params.changed_since}
+    
+    return filters
+
+def parse_categories(category: Optional[str]) -> Optional[List[str]]:
+    """Valida `category=a,b` contra o registro de categorias ("all" = sem filtro)"""
+    if not category:
+        return None
+    
+    requested = {c.strip() for c in category.split(",") if c.strip()} - {ALL_CATEGORIES}
+    unknown = sorted(c for c in requested if c not in CATEGORIES_BY_ID)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Categorias desconhecidas: {', '.join(unknown)}")
+    
+    return sorted(requested) or None
+
+def parse_facets(facets: Optional[str]) -> Optional[List[str]]:
+    """Valida a lista `facets=a,b`"""
+    if not facets:
+        return None
+    
+    requested = [facet.strip() for facet in facets.split(",") if facet.strip()]
+    unknown = sorted(set(requested) - set(FACET_PIPELINES))
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Facetas desconhecidas: {', '.join(unknown)}")
+    
+    return sorted(set(requested))
+
+def format_facets(result: dict, facet_names: List[str]) -> dict:
+    """Formata as contagens do $facet usando CATEGORIES como vocabulário"""
+    total = result["total"][0]["count"] if result["total"] else 0
+    facets = {}
+    
+    if "categories" in facet_names:
+        counts = {item["_id"]: item["count"] for item in result["categories"]}
+        facets["categories"] = [
+            {"id": c["id"], "name": c["name"], "count": total if c["id"] == ALL_CATEGORIES else counts.get(c["id"], 0)}
+            for c in CATEGORIES
+        ]
+    
+    if "hasPool" in facet_names:
+        counts = {item["_id"]: item["count"] for item in result["hasPool"]}
+        facets["hasPool"] = {"true": counts.get(True, 0), "false": counts.get(False, 0)}
+    
+    if "rating_bucket" in facet_names:
+        counts = {item["_id"]: item["count"] for item in result["rating_bucket"]}
+        facets["rating_bucket"] = [
+            {"bucket": f"{lower}-{min(lower + 1, 5)}", "count": counts.get(lower, 0)}
+            for lower in RATING_BUCKETS[:-1]
+        ] + [{"bucket": "sem-avaliacao", "count": counts.get("sem-avaliacao", 0)}]
+    
+    return {"total": total, **facets}
+
+def parse_near(near: str) -> Tuple[float, float]:
+    """Converte `near=lat,lng` em (lat, lng)"""
+    try:
+        lat, lng = (float(value) for value in near.split(","))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Parâmetro near inválido; use lat,lng")
+    if not -90 <= lat <= 90 or not -180 <= lng <= 180:
+        raise HTTPException(status_code=400, detail="Parâmetro near fora do intervalo válido")
+    return lat, lng
+
+def geo_near_stage(params: RestaurantSearch, filters: dict) -> dict:
+    """Estágio $geoNear com a distância em km no campo `distance_km`"""
+    geo_near = {
+        "near": {"type": "Point", "coordinates": [params.near_lng, params.near_lat]},
+        "key": "geo",
+        "distanceField": "distance_km",
+        "distanceMultiplier": 0.001,
+        "spherical": True,
+        "query": filters
+    }
+    if params.max_km is not None:
+        geo_near["maxDistance"] = params.max_km * 1000
+    return {"$geoNear": geo_near}
+
+def text_search_filter(search: str) -> dict:
+    """Busca pelo índice de texto (stemming em português, sem diferenciar acentos)"""
+    return {"$search": search, "$language": "portuguese", "$diacriticSensitive": False}
+
+def prefix_search_filter(search: str) -> dict:
+    """Busca por início do nome normalizado, ancorada e sem `i` para usar o índice"""
+    return {"$regex": f"^{re.escape(name_key(search))}"}
+
+async def on_restaurants_changed(changes: List[Tuple[Optional[dict], Optional[dict]]]):
+    """Propaga escritas (pares antes/depois) para o índice de sugestões, o cache, as estatísticas e a versão das listagens"""
+    if not changes:
+        return
+    
+    restaurant_ids = []
+    delta = {}
+    for before, after in changes:
+        restaurant_id = (after or before)["id"]
+        restaurant_ids.append(restaurant_id)
+        
+        if after is not None:
+            name_index.add(restaurant_id, after["name"])
+        else:
+            name_index.remove(restaurant_id)
+        
+        for field, value in stats_delta(before, after).items():
+            delta[field] = delta.get(field, 0) + value
+    
+    await restaurant_cache.invalidate(*restaurant_ids)
+    await apply_stats_delta(mongo.db, {field: value for field, value in delta.items() if value != 0})
+
+async def on_restaurant_changed(before: Optional[dict], after: Optional[dict]):
+    """Propaga uma única escrita (ver on_restaurants_changed)"""
+    await on_restaurants_changed([(before, after)])
+
+async def apply_feed_event(event: dict):
+    """Atualiza o índice de sugestões e o cache locais com escritas de qualquer instância
+    
+    As estatísticas não entram: o $inc já foi aplicado por quem fez a escrita.
+    Num resync não se sabe o que mudou (ex.: remoção sem imagem anterior), então
+    o índice de sugestões é recarregado do banco.
+    """
+    if event["type"] == "resync":
+        await restaurant_cache.invalidate()
+        await load_name_index()
+        return
+    
+    if event["restaurant"] is not None:
+        name_index.add(event["id"], event["restaurant"]["name"])
+    else:
+        name_index.remove(event["id"])
+    await restaurant_cache.invalidate(event["id"])
+
+change_feed.add_listener(apply_feed_event)
+
+def format_sse(event: dict) -> str:
+    """Formata um evento no protocolo server-sent events"""
+    return f"event: {event['type']}\ndata: {dumps(event).decode('utf-8')}\n\n"
+
+@router.on_event("startup")
+async def connect_database():
+    """Abre o cliente do MongoDB (sem efeito se o lifespan de database.py já abriu)
+
+    Não há handler de shutdown que feche o cliente: quem fecha é o lifespan,
+    depois dos handlers de shutdown (o change stream precisa parar antes).
+    """
+    mongo.connect()
+
+@router.on_event("startup")
+async def create_indexes():
+    """Garante os índices usados pelas consultas antes de atender requisições"""
+    await ensure_indexes(mongo.db)
+
+@router.on_event("startup")
+async def load_name_index():
+    """Carrega os nomes dos restaurantes no índice de sugestões"""
+    restaurants = await mongo.db.restaurants.find({}, {"id": 1, "name": 1, "_id": 0}).to_list(None)
+    name_index.load(restaurants)
+
+@router.on_event("startup")
+async def start_change_feed():
+    """Inicia o watcher do change stream (depois de carregar o índice de sugestões)"""
+    if CHANGE_FEED_ENABLED:
+        await enable_pre_images(mongo.db)
+        change_feed.start()
+
+@router.on_event("shutdown")
+async def stop_change_feed():
+    await change_feed.stop()
 
 @router.get("/categories", response_model=List[Category])
-async def get_categories():
-    """Retorna todas as categorias disponíveis"""
-    return CATEGORIES
+async def get_categories(request: Request):
+    """Retorna todas as categorias disponíveis
+    
+    Responde 304 quando o cliente já tem a versão atual (If-None-Match).
+    """
+    headers = {"ETag": CATEGORIES_ETAG, "Cache-Control": CATEGORIES_CACHE_CONTROL}
+    
+    if etag_matches(request.headers.get("if-none-match"), CATEGORIES_ETAG):
+        return Response(status_code=304, headers=headers)
+    
+    return FastJSONResponse(content=CATEGORIES, headers=headers)
 
 @router.get("/", response_model=List[Restaurant])
 async def get_restaurants(
-    search: Optional[str] = Query(None, description="Buscar por nome do restaurante"),
-    category: Optional[str] = Query(None, description="Filtrar por categoria"),
+    request: Request,
+    search: Optional[str] = Query(None, description="Buscar por nome, localização ou culinária"),
+    search_mode: str = Query("text", regex="^(text|prefix)$", description="text (relevância) ou prefix (início do nome)"),
+    search_fallback: bool = Query(True, description="Usar busca por prefixo quando a busca textual não encontrar nada"),
+    category: Optional[str] = Query(None, description="Filtrar por categorias, separadas por vírgula"),
+    category_mode: str = Query("any", regex="^(any|all)$", description="any (qualquer categoria) ou all (todas)"),
     hasPool: Optional[bool] = Query(None, description="Filtrar por piscina"),
     rating_min: Optional[float] = Query(None, ge=0, le=5, description="Avaliação mínima"),
     rating_max: Optional[float] = Query(None, ge=0, le=5, description="Avaliação máxima"),
     limit: int = Query(50, ge=1, le=100, description="Limite de resultados"),
-    skip: int = Query(0, ge=0, description="Pular resultados")
+    skip: int = Query(0, ge=0, description="Pular resultados"),
+    cursor: Optional[str] = Query(None, description="Cursor da próxima página (cabeçalho X-Next-Cursor)"),
+    fields: Optional[str] = Query(None, description="Campos a retornar, separados por vírgula (id sempre vem)"),
+    near: Optional[str] = Query(None, description="Ordenar por distância a partir de lat,lng"),
+    max_km: Optional[float] = Query(None, gt=0, le=500, description="Distância máxima em km (com near)"),
+    facets: Optional[str] = Query(None, description="Contagens a retornar junto da página: categories, hasPool, rating_bucket"),
+    changed_since: Optional[datetime] = Query(None, description="Somente restaurantes alterados depois desta data (ISO 8601)")
 ):
-    """Retorna lista de restaurantes com filtros opcionais"""
+    """Retorna lista de restaurantes com filtros opcionais
+
+    A próxima página pode ser obtida pelo cursor devolvido no cabeçalho
+    X-Next-Cursor, que evita o custo crescente de `skip` em páginas profundas.
+    A busca textual é ordenada por relevância e pagina apenas com `skip`;
+    quando ela não encontra nada, o fallback por prefixo pagina também por cursor.
+    Com `near`, os resultados vêm ordenados por distância e trazem
+    `distance_km`; só restaurantes com `geo` preenchido participam.
+    Com `facets`, a resposta vira {"items": [...], "facets": {...}}, com as
+    contagens calculadas para os filtros atuais na mesma agregação.
+    Os documentos vêm do banco (já validados na escrita) e são serializados
+    diretamente, sem recriar modelos.
+    A ETag vem da versão das listagens, incrementada a cada escrita; com
+    If-None-Match atual a resposta é 304 sem consultar a página. Listas não
+    têm Last-Modified: remoções não deixam updated_at para comparar.
+    `changed_since` devolve só os alterados depois da data (remoções não
+    aparecem, mas mudam a ETag).
+    """
     
-    # Construir filtros
-    filters = {}
+    near_lat, near_lng = parse_near(near) if near else (None, None)
+    if max_km is not None and near is None:
+        raise HTTPException(status_code=400, detail="max_km exige o parâmetro near")
+    
+    params = RestaurantSearch(
+        search=search.strip() if search else None,
+        search_mode=search_mode,
+        search_fallback=search_fallback,
+        categories=parse_categories(category),
+        category_mode=category_mode,
+        hasPool=hasPool,
+        rating_min=rating_min,
+        rating_max=rating_max,
+        near_lat=near_lat,
+        near_lng=near_lng,
+        max_km=max_km,
+        changed_since=changed_since
+    )
+    projected_fields = parse_fields(fields)
+    facet_names = parse_facets(facets)
     
-    if search:
-        filters["name"] = {"$regex": search, "$options": "i"}
+    cache_key = (tuple(params.dict().values()), limit, skip, cursor, projected_fields, facet_names)
     
-    if category and category != "all":
-        filters["categories"] = {"$in": [category]}
+    # A versão só é lida aqui quando o cliente manda a ETag; nos demais casos
+    # ela vem da página em cache ou é lida junto com a página nova
+    version = None
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        version = await get_list_version(mongo.db)
+        etag = make_etag(cache_key, version)
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=validator_headers(etag, None, RESTAURANTS_CACHE_CONTROL))
     
-    if hasPool is not None:
-        filters["hasPool"] = hasPool
+    # Consultar o cache antes do banco
+    generation = await restaurant_cache.generation()
+    page = await restaurant_cache.get_list(cache_key, generation)
+    if page is not None and version is not None and page["version"] != version:
+        # Escrita que o cache local não viu (seeder, instância sem change
+        # stream): servir a página guardada repetiria a ETag antiga
+        page = None
     
-    if rating_min is not None or rating_max is not None:
-        rating_filter = {}
-        if rating_min is not None:
-            rating_filter["$gte"] = rating_min
-        if rating_max is not None:
-            rating_filter["$lte"] = rating_max
-        filters["rating"] = rating_filter
+    if page is None:
+        # A versão é lida antes da página: uma escrita no meio do caminho só
+        # faz o cliente baixar a página de novo na próxima requisição
+        if version is None:
+            version = await get_list_version(mongo.db)
+        if facet_names:
+            page = await find_restaurants_with_facets(params, facet_names, limit, skip, cursor, projected_fields)
+        else:
+            page = await find_restaurants_page(params, limit, skip, cursor, projected_fields)
+        page["version"] = version
+        await restaurant_cache.set_list(cache_key, generation, page)
+    
+    headers = validator_headers(make_etag(cache_key, page["version"]), None, RESTAURANTS_CACHE_CONTROL)
+    if page["next_cursor"]:
+        headers["X-Next-Cursor"] = page["next_cursor"]
+    items = [public_document(restaurant, projected_fields) for restaurant in page["items"]]
+    
+    if facet_names:
+        return FastJSONResponse(content={"items": items, "facets": page["facets"]}, headers=headers)
+    return FastJSONResponse(content=items, headers=headers)
+
+async def find_restaurants_with_facets(
+    params: RestaurantSearch,
+    facet_names: List[str],
+    limit: int,
+    skip: int = 0,
+    cursor: Optional[str] = None,
+    fields: Optional[List[str]] = None
+) -> dict:
+    """Retorna a página e as contagens por faceta em uma única agregação $facet
+    
+    As contagens consideram todos os filtros, mas não o cursor nem a paginação.
+    A busca textual aqui não usa o fallback por prefixo.
+    """
+    
+    filters = build_filters(params)
+    near = params.near_lat is not None
+    text_search = bool(params.search) and params.search_mode == "text" and not near
+    
+    if cursor and (near or text_search):
+        raise HTTPException(status_code=400, detail="Cursor não é suportado na busca textual ou por proximidade")
+    if params.search and not text_search:
+        filters["name_key"] = prefix_search_filter(params.search)
+    
+    # Estágio inicial com os filtros e a ordenação da página
+    if near:
+        stages = [geo_near_stage(params, filters)]
+        items = []
+    elif text_search:
+        stages = [{"$match": {**filters, "$text": text_search_filter(params.search)}}]
+        items = [{"$sort": {"score": {"$meta": "textScore"}, "name": 1, "id": 1}}]
+    else:
+        stages = [{"$match": filters}]
+        items = [{"$match": cursor_filter(cursor)}] if cursor else []
+        items.append({"$sort": dict(LIST_SORT)})
+    
+    projection = {"_id": 0}
+    if fields:
+        projection.update({field: 1 for field in fields}, name=1)
+        if near:
+            projection["distance_km"] = 1
+    
+    if skip:
+        items.append({"$skip": skip})
+    items.append({"$limit": limit})
+    items.append({"$project": projection})
+    
+    facet = {"items": items, "total": [{"$count": "count"}]}
+    facet.update({name: FACET_PIPELINES[name] for name in facet_names})
+    
+    result = (await mongo.read_db.restaurants.aggregate(stages + [{"$facet": facet}]).to_list(1))[0]
+    restaurants = result["items"]
+    
+    next_cursor = None
+    if not near and not text_search and len(restaurants) == limit:
+        last = restaurants[-1]
+        next_cursor = encode_cursor(last["name"], last["id"])
+    
+    return {"items": restaurants, "next_cursor": next_cursor, "facets": format_facets(result, facet_names)}
+
+async def find_restaurants_page(
+    params: RestaurantSearch,
+    limit: int,
+    skip: int = 0,
+    cursor: Optional[str] = None,
+    fields: Optional[List[str]] = None
+) -> dict:
+    """Executa a consulta de listagem e retorna os documentos e o próximo cursor"""
+    
+    filters = build_filters(params)
+    
+    # Projeção: o cursor precisa de id e name
+    projection = {"_id": 0}
+    if fields:
+        projection.update({field: 1 for field in fields}, name=1)
+    
+    # Busca por proximidade ($text não pode ser combinado com $geoNear)
+    if params.near_lat is not None:
+        if cursor:
+            raise HTTPException(status_code=400, detail="Cursor não é suportado na busca por proximidade")
+        if params.search:
+            filters["name_key"] = prefix_search_filter(params.search)
+        
+        pipeline = [geo_near_stage(params, filters)]
+        if skip:
+            pipeline.append({"$skip": skip})
+        pipeline.append({"$limit": limit})
+        pipeline.append({"$project": {**projection, "distance_km": 1} if fields else projection})
+        
+        restaurants = await mongo.read_db.restaurants.aggregate(pipeline).to_list(limit)
+        return {"items": restaurants, "next_cursor": None}
+    
+    # Busca textual ordenada por relevância
+    if params.search and params.search_mode == "text":
+        text_filters = {**filters, "$text": text_search_filter(params.search)}
+        
+        # O fallback por prefixo vale quando a busca textual não encontra nada,
+        # qualquer que seja a página; com cursor ou skip é preciso conferir isso,
+        # já que as páginas seguintes do fallback chegam com search_mode=text
+        use_text = True
+        if params.search_fallback and (cursor or skip):
+            use_text = await mongo.read_db.restaurants.find_one(text_filters, {"_id": 1}) is not None
+    else:
+        use_text = False
+    
+    if use_text:
+        if cursor:
+            raise HTTPException(status_code=400, detail="Cursor não é suportado na busca textual")
+        
+        score = {"$meta": "textScore"}
+        query = mongo.read_db.restaurants.find(text_filters, {**projection, "score": score}).sort([("score", score)] + LIST_SORT)
+        if skip:
+            query = query.skip(skip)
+        restaurants = await query.limit(limit).to_list(length=limit)
+        
+        if restaurants or skip or not params.search_fallback:
+            return {"items": restaurants, "next_cursor": None}
+    
+    if params.search:
+        filters["name_key"] = prefix_search_filter(params.search)
+    
+    # Continuar a partir do cursor, se informado
+    if cursor:
+        filters = {"$and": [filters, cursor_filter(cursor)]} if filters else cursor_filter(cursor)
     
     # Buscar no banco
-    cursor = db.restaurants.find(filters).skip(skip).limit(limit).sort("name", 1)
-    restaurants = await cursor.to_list(length=limit)
+    query = mongo.read_db.restaurants.find(filters, projection).sort(LIST_SORT)
+    if skip:
+        query = query.skip(skip)
+    restaurants = await query.limit(limit).to_list(length=limit)
+    
+    next_cursor = None
+    if len(restaurants) == limit:
+        last = restaurants[-1]
+        next_cursor = encode_cursor(last["name"], last["id"])
+    
+    return {"items": restaurants, "next_cursor": next_cursor}
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    """Retorna os contadores do cache de leitura"""
+    return restaurant_cache.stats()
+
+async def export_ndjson(cursor):
+    """Gera uma linha JSON por documento, à medida que chegam do cursor"""
+    async for restaurant in cursor:
+        yield dumps(restaurant) + b"\n"
+
+async def export_csv(cursor, columns: List[str]):
+    """Gera o cabeçalho e uma linha CSV por documento
+
+    Listas viram valores separados por | e objetos (geo) viram JSON.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    
+    writer.writerow(columns)
+    yield buffer.getvalue()
+    
+    async for restaurant in cursor:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow([
+            "|".join(value) if isinstance(value, list)
+            else dumps(value).decode("utf-8") if isinstance(value, dict)
+            else value.isoformat() if isinstance(value, datetime)
+            else "" if value is None
+            else value
+            for value in (restaurant.get(column) for column in columns)
+        ])
+        yield buffer.getvalue()
+
+@router.get("/stream")
+async def stream_restaurant_changes(
+    request: Request,
+    category: Optional[str] = Query(None, description="Receber só eventos destas categorias, separadas por vírgula")
+):
+    """Envia criações, alterações e remoções em tempo real (server-sent events)
+    
+    Todos os clientes compartilham um único change stream. Um evento
+    `resync` indica que eventos foram perdidos (cliente lento ou histórico
+    do oplog esgotado) e que a lista deve ser recarregada.
+    """
+    if not change_feed.running:
+        raise HTTPException(status_code=503, detail="Atualizações em tempo real indisponíveis")
+    
+    subscription = change_feed.subscribe(parse_categories(category))
+    
+    async def events():
+        try:
+            yield "retry: 5000\n\n"
+            while not await request.is_disconnected():
+                event = await subscription.get(timeout=STREAM_HEARTBEAT_SECONDS)
+                yield format_sse(event) if event is not None else ": ping\n\n"
+        finally:
+            change_feed.unsubscribe(subscription)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/stream/stats")
+async def get_stream_stats():
+    """Retorna o estado do change stream e o número de assinantes"""
+    return change_feed.stats()
+
+@router.get("/export")
+async def export_restaurants(
+    format: str = Query("ndjson", regex="^(ndjson|csv)$", description="ndjson ou csv"),
+    category: Optional[str] = Query(None, description="Filtrar por categorias, separadas por vírgula"),
+    category_mode: str = Query("any", regex="^(any|all)$", description="any (qualquer categoria) ou all (todas)"),
+    hasPool: Optional[bool] = Query(None, description="Filtrar por piscina"),
+    rating_min: Optional[float] = Query(None, ge=0, le=5, description="Avaliação mínima"),
+    rating_max: Optional[float] = Query(None, ge=0, le=5, description="Avaliação máxima"),
+    fields: Optional[str] = Query(None, description="Campos a exportar, separados por vírgula"),
+    batch_size: int = Query(500, ge=1, le=10000, description="Documentos por lote lido do banco")
+):
+    """Exporta o catálogo em streaming (NDJSON ou CSV)
+    
+    Os documentos são enviados conforme chegam do cursor do MongoDB, sem
+    montar a resposta inteira em memória.
+    """
+    params = RestaurantSearch(
+        categories=parse_categories(category),
+        category_mode=category_mode,
+        hasPool=hasPool,
+        rating_min=rating_min,
+        rating_max=rating_max
+    )
+    projected_fields = parse_fields(fields)
+    
+    projection = {"_id": 0, "name_key": 0}
+    if projected_fields:
+        projection = {"_id": 0, **{field: 1 for field in projected_fields}}
+    
+    cursor = mongo.read_db.restaurants.find(build_filters(params), projection).sort(LIST_SORT).batch_size(batch_size)
+    
+    if format == "csv":
+        return StreamingResponse(
+            export_csv(cursor, projected_fields or EXPORT_COLUMNS),
+            media_type="text/csv; charset=utf-8",
+            headers={"Content-Disposition": 'attachment; filename="restaurants.csv"'}
+        )
+    
+    return StreamingResponse(export_ndjson(cursor), media_type="application/x-ndjson")
+
+def check_bulk_size(items: list):
+    """Rejeita lotes vazios ou maiores que BULK_MAX_ITEMS"""
+    if not items:
+        raise HTTPException(status_code=400, detail="O lote está vazio")
+    if len(items) > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"O lote deve ter no máximo {BULK_MAX_ITEMS} itens")
+
+async def find_names_in_use(names: List[str]) -> List[dict]:
+    """Busca, em uma única consulta ao índice `name_key`, restaurantes com algum dos nomes"""
+    keys = list({name_key(name) for name in names})
+    return await mongo.db.restaurants.find({"name_key": {"$in": keys}}, {"id": 1, "name_key": 1, "_id": 0}).to_list(None)
+
+async def run_bulk_write(operations: list) -> dict:
+    """Executa as operações em um bulk_write não ordenado
+
+    Retorna as mensagens de erro indexadas pela posição da operação.
+    """
+    if not operations:
+        return {}
+    try:
+        await mongo.db.restaurants.bulk_write(operations, ordered=False)
+    except BulkWriteError as error:
+        return {
+            item["index"]: (
+                "Já existe um restaurante com este nome"
+                if item.get("code") == DUPLICATE_KEY_ERROR else item.get("errmsg", "Erro ao gravar")
+            )
+            for item in error.details.get("writeErrors", [])
+        }
+    return {}
+
+def bulk_response(results: List[dict]) -> dict:
+    """Resumo padrão das operações em lote"""
+    failed = sum(1 for result in results if result["status"] == "error")
+    return {"succeeded": len(results) - failed, "failed": failed, "results": results}
+
+@router.post("/bulk")
+async def create_restaurants_bulk(restaurants: List[RestaurantCreate]):
+    """Cria vários restaurantes com uma consulta de nomes e um bulk_write"""
+    check_bulk_size(restaurants)
+    
+    names_in_use = {item["name_key"] for item in await find_names_in_use([r.name for r in restaurants])}
+    
+    results = []
+    operations = []
+    pending = []
+    for index, restaurant in enumerate(restaurants):
+        key = name_key(restaurant.name)
+        if key in names_in_use:
+            results.append({"index": index, "status": "error", "detail": "Já existe um restaurante com este nome"})
+            continue
+        names_in_use.add(key)
+        
+        restaurant_data = Restaurant(**restaurant.dict()).dict()
+        restaurant_data["name_key"] = key
+        results.append({"index": index, "id": restaurant_data["id"], "status": "created"})
+        operations.append(InsertOne(restaurant_data))
+        pending.append((results[-1], restaurant_data))
+    
+    errors = await run_bulk_write(operations)
+    
+    changes = []
+    for position, (result, restaurant_data) in enumerate(pending):
+        if position in errors:
+            result.update(status="error", detail=errors[position])
+        else:
+            changes.append((None, restaurant_data))
+    await on_restaurants_changed(changes)
+    
+    return bulk_response(results)
+
+@router.put("/bulk")
+async def update_restaurants_bulk(updates: List[RestaurantBulkUpdate]):
+    """Atualiza vários restaurantes com uma leitura, uma consulta de nomes e um bulk_write"""
+    check_bulk_size(updates)
+    
+    ids = [update.id for update in updates]
+    existing = {
+        restaurant["id"]: restaurant
+        for restaurant in await mongo.db.restaurants.find({"id": {"$in": ids}}, {"_id": 0}).to_list(None)
+    }
+    names = [update.name for update in updates if update.name is not None]
+    names_in_use = {item["name_key"]: item["id"] for item in await find_names_in_use(names)} if names else {}
+    
+    results = []
+    operations = []
+    pending = []
+    seen_ids = set()
+    for index, update in enumerate(updates):
+        if update.id not in existing:
+            results.append({"index": index, "id": update.id, "status": "error", "detail": "Restaurante não encontrado"})
+            continue
+        if update.id in seen_ids:
+            results.append({"index": index, "id": update.id, "status": "error", "detail": "Restaurante repetido no lote"})
+            continue
+        
+        update_data = {k: v for k, v in update.dict(exclude={"id"}).items() if v is not None}
+        update_data["updated_at"] = datetime.utcnow()
+        
+        if "name" in update_data:
+            key = update_data["name_key"] = name_key(update_data["name"])
+            if names_in_use.get(key, update.id) != update.id:
+                results.append({"index": index, "id": update.id, "status": "error", "detail": "Já existe outro restaurante com este nome"})
+                continue
+            names_in_use[key] = update.id
+        seen_ids.add(update.id)
+        
+        results.append({"index": index, "id": update.id, "status": "updated"})
+        operations.append(UpdateOne({"id": update.id}, {"$set": update_data}))
+        pending.append((results[-1], existing[update.id], {**existing[update.id], **update_data}))
+    
+    errors = await run_bulk_write(operations)
     
-    return [Restaurant(**restaurant) for restaurant in restaurants]
+    changes = []
+    for position, (result, before, after) in enumerate(pending):
+        if position in errors:
+            result.update(status="error", detail=errors[position])
+        else:
+            changes.append((before, after))
+    await on_restaurants_changed(changes)
+    
+    return bulk_response(results)
+
+@router.post("/bulk/delete")
+async def delete_restaurants_bulk(ids: List[str] = Body(..., description="IDs dos restaurantes")):
+    """Remove vários restaurantes com uma leitura e um bulk_write"""
+    check_bulk_size(ids)
+    
+    existing = {
+        restaurant["id"]: restaurant
+        for restaurant in await mongo.db.restaurants.find({"id": {"$in": ids}}, {"_id": 0}).to_list(None)
+    }
+    
+    results = []
+    operations = []
+    pending = []
+    for index, restaurant_id in enumerate(ids):
+        if restaurant_id not in existing:
+            results.append({"index": index, "id": restaurant_id, "status": "error", "detail": "Restaurante não encontrado"})
+            continue
+        
+        results.append({"index": index, "id": restaurant_id, "status": "deleted"})
+        operations.append(DeleteOne({"id": restaurant_id}))
+        pending.append((results[-1], existing.pop(restaurant_id)))
+    
+    errors = await run_bulk_write(operations)
+    
+    changes = []
+    for position, (result, before) in enumerate(pending):
+        if position in errors:
+            result.update(status="error", detail=errors[position])
+        else:
+            changes.append((before, None))
+    await on_restaurants_changed(changes)
+    
+    return bulk_response(results)
 
 @router.get("/{restaurant_id}", response_model=Restaurant)
-async def get_restaurant(restaurant_id: str):
-    """Retorna um restaurante específico"""
-    restaurant = await db.restaurants.find_one({"id": restaurant_id})
+async def get_restaurant(
+    restaurant_id: str,
+    request: Request,
+    fields: Optional[str] = Query(None, description="Campos a retornar, separados por vírgula (id sempre vem)")
+):
+    """Retorna um restaurante específico
     
-    if not restaurant:
-        raise HTTPException(status_code=404, detail="Restaurante não encontrado")
+    ETag e Last-Modified vêm de updated_at; com If-None-Match ou
+    If-Modified-Since atuais a resposta é 304, sem corpo.
+    """
+    projected_fields = parse_fields(fields)
+    restaurant = await restaurant_cache.get_restaurant(restaurant_id)
+    
+    if restaurant is None:
+        generation = await restaurant_cache.generation()
+        restaurant = await mongo.db.restaurants.find_one({"id": restaurant_id}, {"_id": 0})
+        
+        if not restaurant:
+            raise HTTPException(status_code=404, detail="Restaurante não encontrado")
+        
+        await restaurant_cache.set_restaurant(restaurant_id, restaurant, generation)
+    
+    last_modified = as_utc(restaurant.get("updated_at"))
+    etag = make_etag(restaurant["id"], last_modified.isoformat() if last_modified else None, projected_fields)
+    headers = validator_headers(etag, last_modified, RESTAURANTS_CACHE_CONTROL)
     
-    return Restaurant(**restaurant)
+    if not_modified(request.headers, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    
+    return FastJSONResponse(content=public_document(restaurant, projected_fields), headers=headers)
 
 @router.post("/", response_model=Restaurant)
 async def create_restaurant(restaurant: RestaurantCreate):
     """Cria um novo restaurante"""
     
-    # Verificar se já existe um restaurante com o mesmo nome
-    existing = await db.restaurants.find_one({"name": {"$regex": f"^{re.escape(restaurant.name)}$", "$options": "i"}})
-    if existing:
-        raise HTTPException(status_code=400, detail="Já existe um restaurante com este nome")
-    
     # Criar novo restaurante
     new_restaurant = Restaurant(**restaurant.dict())
     
-    # Inserir no banco
-    await db.restaurants.insert_one(new_restaurant.dict())
+    # Inserir no banco; o índice único em name_key impede nomes repetidos
+    restaurant_data = new_restaurant.dict()
+    restaurant_data["name_key"] = name_key(new_restaurant.name)
+    try:
+        await mongo.db.restaurants.insert_one(restaurant_data)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Já existe um restaurante com este nome")
+    await on_restaurant_changed(None, restaurant_data)
     
     return new_restaurant
 
-@router.put("/{restaurant_id}", response_model=Restaurant)
-async def update_restaurant(restaurant_id: str, restaurant_update: RestaurantUpdate):
-    """Atualiza um restaurante existente"""
+async def apply_restaurant_update(restaurant_id: str, update_data: dict) -> dict:
+    """Aplica `update_data` em uma única ida ao banco e retorna o documento atualizado
+    
+    O documento anterior vem de find_one_and_update e o novo é obtido aplicando
+    o mesmo $set em memória, o que também alimenta o delta das estatísticas.
+    """
+    update_data["updated_at"] = datetime.utcnow()
+    
+    if "name" in update_data:
+        update_data["name_key"] = name_key(update_data["name"])
+    
+    # O índice único em name_key impede nomes repetidos
+    try:
+        existing = await mongo.db.restaurants.find_one_and_update(
+            {"id": restaurant_id},
+            {"$set": update_data},
+            projection={"_id": 0},
+            return_document=ReturnDocument.BEFORE
+        )
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Já existe outro restaurante com este nome")
     
-    # Verificar se o restaurante existe
-    existing = await db.restaurants.find_one({"id": restaurant_id})
     if not existing:
         raise HTTPException(status_code=404, detail="Restaurante não encontrado")
     
+    updated_restaurant = {**existing, **update_data}
+    await on_restaurant_changed(existing, updated_restaurant)
+    return updated_restaurant
+
+@router.put("/{restaurant_id}", response_model=Restaurant)
+async def update_restaurant(restaurant_id: str, restaurant_update: RestaurantUpdate):
+    """Atualiza um restaurante existente"""
+    
     # Preparar dados para atualização
-    update_data = {k: v for k, v in restaurant_update.dict().items() if v is not None}
-    update_data["updated_at"] = datetime.utcnow()
+    update_data = {k: v for k, v in restaurant_update.dict(exclude={"updated_at"}).items() if v is not None}
     
-    # Verificar se o nome não está sendo usado por outro restaurante
-    if "name" in update_data:
-        name_check = await db.restaurants.find_one({
-            "name": {"$regex": f"^{re.escape(update_data['name'])}$", "$options": "i"},
-            "id": {"$ne": restaurant_id}
-        })
-        if name_check:
-            raise HTTPException(status_code=400, detail="Já existe outro restaurante com este nome")
-    
-    # Atualizar no banco
-    await db.restaurants.update_one(
-        {"id": restaurant_id},
-        {"$set": update_data}
-    )
+    updated_restaurant = await apply_restaurant_update(restaurant_id, update_data)
+    return Restaurant(**updated_restaurant)
+
+@router.patch("/{restaurant_id}", response_model=Restaurant)
+async def patch_restaurant(restaurant_id: str, restaurant_update: RestaurantUpdate):
+    """Atualiza apenas os campos enviados
     
-    # Retornar restaurante atualizado
-    updated_restaurant = await db.restaurants.find_one({"id": restaurant_id})
+    Campos opcionais enviados como null são apagados (instagram, email,
+    rating, cuisine); os demais não aceitam null.
+    """
+    update_data = restaurant_update.dict(exclude_unset=True, exclude={"updated_at"})
+    
+    null_fields = sorted(k for k, v in update_data.items() if v is None and k in NON_NULLABLE_FIELDS)
+    if null_fields:
+        raise HTTPException(status_code=400, detail=f"Campos não podem ser nulos: {', '.join(null_fields)}")
+    if not update_data:
+        raise HTTPException(status_code=400, detail="Nenhum campo para atualizar")
+    
+    updated_restaurant = await apply_restaurant_update(restaurant_id, update_data)
     return Restaurant(**updated_restaurant)
 
 @router.delete("/{restaurant_id}")
 async def delete_restaurant(restaurant_id: str):
     """Remove um restaurante"""
     
-    # Verificar se o restaurante existe
-    existing = await db.restaurants.find_one({"id": restaurant_id})
+    # Remover do banco, obtendo o documento removido na mesma operação
+    existing = await mongo.db.restaurants.find_one_and_delete({"id": restaurant_id}, projection={"_id": 0})
     if not existing:
         raise HTTPException(status_code=404, detail="Restaurante não encontrado")
-    
-    # Remover do banco
-    await db.restaurants.delete_one({"id": restaurant_id})
+    await on_restaurant_changed(existing, None)
     
     return {"message": "Restaurante removido com sucesso"}
 
 @router.get("/search/suggestions")
 async def get_search_suggestions(q: str = Query(..., min_length=1, description="Termo de busca")):
-    """Retorna sugestões de busca baseadas no nome dos restaurantes"""
+    """Retorna sugestões de busca baseadas no nome dos restaurantes
     
-    suggestions = await db.restaurants.find(
-        {"name": {"$regex": q, "$options": "i"}},
-        {"name": 1, "_id": 0}
-    ).limit(5).to_list(5)
-    
-    return [suggestion["name"] for suggestion in suggestions]
+    As sugestões vêm do índice em memória, sem consultar o banco.
+    """
+    return name_index.search(q, limit=5)
 
 @router.get("/stats/overview")
 async def get_restaurant_stats():
-    """Retorna estatísticas gerais dos restaurantes"""
-    
-    total_restaurants = await db.restaurants.count_documents({})
-    
-    restaurants_with_pool = await db.restaurants.count_documents({"hasPool": True})
+    """Retorna estatísticas gerais dos restaurantes
     
-    # Estatísticas por categoria
-    pipeline = [
-        {"$unwind": "$categories"},
-        {"$group": {"_id": "$categories", "count": {"$sum": 1}}},
-        {"$sort": {"count": -1}}
-    ]
-    category_stats = await db.restaurants.aggregate(pipeline).to_list(None)
-    
-    # Média de avaliações
-    rating_pipeline = [
-        {"$match": {"rating": {"$ne": None}}},
-        {"$group": {"_id": None, "avg_rating": {"$avg": "$rating"}, "count": {"$sum": 1}}}
-    ]
-    rating_stats = await db.restaurants.aggregate(rating_pipeline).to_list(1)
-    
-    return {
-        "total_restaurants": total_restaurants,
-        "restaurants_with_pool": restaurants_with_pool,
-        "pool_percentage": round((restaurants_with_pool / total_restaurants * 100), 2) if total_restaurants > 0 else 0,
-        "category_distribution": category_stats,
-        "average_rating": round(rating_stats[0]["avg_rating"], 2) if rating_stats else 0,
-        "rated_restaurants": rating_stats[0]["count"] if rating_stats else 0
-    }
\ No newline at end of file
+    Lê o documento materializado mantido pelas escritas (ver stats.py).
+    """
+    return await get_overview(mongo.db)
+
+@router.post("/stats/rebuild")
+async def rebuild_restaurant_stats():
+    """Recalcula do zero o documento de estatísticas"""
+    await rebuild_stats(mongo.db)
+    return await get_overview(mongo.db)
\ No newline at end of file
@@ -0,0 +1,156 @@
+import heapq
+from bisect import bisect_left, insort
+from collections import defaultdict
+from itertools import islice
+from typing import Dict, Iterable, List, Set, Tuple
+from models.restaurant import fold_text
+
+# Acima desta estimativa de resultados, percorrer os nomes em ordem é mais
+# barato que montar e ordenar o conjunto inteiro
+SCAN_THRESHOLD = 2000
+SCAN_BUDGET = 20000
+
+class NameIndex:
+    """Índice em memória dos nomes de restaurantes para autocompletar
+
+    Consultas com 3 ou mais caracteres usam trigramas (busca por trecho do
+    nome); consultas menores usam prefixo de palavra sobre uma lista ordenada.
+    Tudo é comparado sem acentos e sem diferença de caixa ("guama" encontra
+    "Rio Guamá"). Os nomes também ficam ordenados, para que os que começam
+    com o termo sejam achados por busca binária sem percorrer os resultados.
+    """
+
+    def __init__(self):
+        self._names: Dict[str, str] = {}
+        self._folded: Dict[str, str] = {}
+        self._trigrams: Dict[str, Set[str]] = defaultdict(set)
+        self._tokens: List[Tuple[str, str]] = []
+        self._sorted_names: List[Tuple[str, str]] = []
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    @staticmethod
+    def _trigrams_of(text: str) -> Set[str]:
+        return {text[i:i + 3] for i in range(len(text) - 2)}
+
+    def load(self, restaurants: Iterable[dict]):
+        """Reconstrói o índice a partir de documentos com `id` e `name`
+
+        Nomes e palavras são ordenados uma única vez no fim, em vez do insort
+        por restaurante de `add` (O(n) por inserção).
+        """
+        self.clear()
+        for restaurant in restaurants:
+            self._names[restaurant["id"]] = restaurant["name"]
+
+        tokens = []
+        for restaurant_id, name in self._names.items():
+            folded = fold_text(name)
+            self._folded[restaurant_id] = folded
+            for trigram in self._trigrams_of(folded):
+                self._trigrams[trigram].add(restaurant_id)
+            tokens.extend((token, restaurant_id) for token in set(folded.split()))
+        tokens.sort()
+        self._tokens = tokens
+        self._sorted_names = sorted((folded, restaurant_id) for restaurant_id, folded in self._folded.items())
+
+    def clear(self):
+        self._names.clear()
+        self._folded.clear()
+        self._trigrams.clear()
+        self._tokens.clear()
+        self._sorted_names.clear()
+
+    def add(self, restaurant_id: str, name: str):
+        """Adiciona ou substitui o nome de um restaurante"""
+        if restaurant_id in self._names:
+            self.remove(restaurant_id)
+
+        folded = fold_text(name)
+        self._names[restaurant_id] = name
+        self._folded[restaurant_id] = folded
+
+        for trigram in self._trigrams_of(folded):
+            self._trigrams[trigram].add(restaurant_id)
+        for token in set(folded.split()):
+            insort(self._tokens, (token, restaurant_id))
+        insort(self._sorted_names, (folded, restaurant_id))
+
+    def remove(self, restaurant_id: str):
+        """Remove um restaurante do índice (ignora ids desconhecidos)"""
+        if restaurant_id not in self._names:
+            return
+
+        folded = self._folded.pop(restaurant_id)
+        del self._names[restaurant_id]
+
+        for trigram in self._trigrams_of(folded):
+            ids = self._trigrams.get(trigram)
+            if ids is not None:
+                ids.discard(restaurant_id)
+                if not ids:
+                    del self._trigrams[trigram]
+        for token in set(folded.split()):
+            position = bisect_left(self._tokens, (token, restaurant_id))
+            if position < len(self._tokens) and self._tokens[position] == (token, restaurant_id):
+                del self._tokens[position]
+        position = bisect_left(self._sorted_names, (folded, restaurant_id))
+        if position < len(self._sorted_names) and self._sorted_names[position] == (folded, restaurant_id):
+            del self._sorted_names[position]
+
+    def search(self, query: str, limit: int = 5) -> List[str]:
+        """Retorna até `limit` nomes que contêm o termo buscado"""
+        folded_query = " ".join(fold_text(query).split())
+        if not folded_query:
+            return []
+
+        # Nomes que começam com o termo aparecem primeiro, já em ordem
+        prefixed = []
+        position = bisect_left(self._sorted_names, (folded_query, ""))
+        while (
+            len(prefixed) < limit
+            and position < len(self._sorted_names)
+            and self._sorted_names[position][0].startswith(folded_query)
+        ):
+            prefixed.append(self._sorted_names[position][1])
+            position += 1
+        if len(prefixed) == limit:
+            return [self._names[rid] for rid in prefixed]
+
+        if len(folded_query) >= 3:
+            postings = sorted(
+                (self._trigrams.get(trigram, set()) for trigram in self._trigrams_of(folded_query)),
+                key=len
+            )
+            estimate = len(postings[0])
+            matches = lambda folded: folded_query in folded
+        else:
+            start = bisect_left(self._tokens, (folded_query, ""))
+            end = bisect_left(self._tokens, (folded_query + "\uffff",))
+            estimate = end - start
+            matches = lambda folded: any(token.startswith(folded_query) for token in folded.split())
+
+        # Completa com os que contêm o termo no meio, em ordem alfabética
+        needed = limit - len(prefixed)
+        others = []
+        if estimate > SCAN_THRESHOLD:
+            # Termo comum: percorrer os nomes já ordenados costuma achar os
+            # primeiros logo; a estimativa pode errar, por isso há um limite
+            for folded, rid in islice(self._sorted_names, SCAN_BUDGET):
+                if not folded.startswith(folded_query) and matches(folded):
+                    others.append(rid)
+                    if len(others) == needed:
+                        break
+        if len(others) < needed:
+            if len(folded_query) >= 3:
+                candidates = set.intersection(*postings)
+            else:
+                candidates = {rid for _, rid in self._tokens[start:end]}
+            others = [
+                rid for _, rid in heapq.nsmallest(needed, (
+                    (self._folded[rid], rid) for rid in candidates
+                    if not self._folded[rid].startswith(folded_query) and matches(self._folded[rid])
+                ))
+            ]
+        return [self._names[rid] for rid in prefixed + others]
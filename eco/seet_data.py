@@ -1,18 +1,20 @@
+import argparse
 import asyncio
-from motor.motor_asyncio import AsyncIOMotorClient
-import os
+import csv
+import json
+from datetime import datetime
+from pydantic import ValidationError
+from pymongo import InsertOne, UpdateOne
 from dotenv import load_dotenv
 from pathlib import Path
-from models.restaurant import Restaurant
+from models.restaurant import Restaurant, RestaurantCreate, fold_text, name_key
+from stats import bump_list_version, rebuild_stats
+from indexes import ensure_indexes
+from database import mongo
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
-
 # Dados dos restaurantes do TripAdvisor
 RESTAURANT_DATA = [
     {
@@ -212,19 +214,151 @@ RESTAURANT_DATA = [
     }
 ]
 
-async def seed_restaurants():
-    """Popula o banco de dados com dados iniciais dos restaurantes"""
+# Coordenadas aproximadas (centro da localidade) dos lugares citados em
+# `location`, usadas para preencher o campo `geo`. A ordem importa: nomes
+# mais específicos vêm antes dos mais gerais.
+KNOWN_PLACES = [
+    ("furo do sao benedito", (-1.5040, -48.4580)),
+    ("furo da paciencia", (-1.4958, -48.4722)),
+    ("piriquitaquara", (-1.5120, -48.4540)),
+    ("combu", (-1.4977, -48.4697)),
+    ("rio guama", (-1.4736, -48.4547)),
+    ("cotijuba", (-1.2286, -48.5519)),
+    ("icoaraci", (-1.2986, -48.4794)),
+    ("outeiro", (-1.2681, -48.4575)),
+    ("mosqueiro", (-1.1689, -48.4719))
+]
+
+def geo_from_location(location: str):
+    """Retorna um ponto GeoJSON para a localidade citada no texto, se conhecida"""
+    folded = fold_text(location)
+    for place, (lat, lng) in KNOWN_PLACES:
+        if place in folded:
+            return {"type": "Point", "coordinates": [lng, lat]}
+    return None
+
+# Campos comparados pela sincronização para decidir se um restaurante mudou
+SYNC_FIELDS = list(RestaurantCreate.__fields__) + ["name_key"]
+
+# Colunas de CSV com listas (valores separados por |, como na exportação)
+CSV_LIST_FIELDS = {"phones", "categories"}
+
+def load_records(path: str):
+    """Lê restaurantes de um arquivo .json (lista), .ndjson ou .csv"""
+    suffix = Path(path).suffix.lower()
+    with open(path, encoding="utf-8", newline="") as file:
+        if suffix == ".csv":
+            records = []
+            for row in csv.DictReader(file):
+                record = {key: value for key, value in row.items() if value not in (None, "")}
+                # geo vem como JSON na exportação; sem ele é recalculado a partir de location
+                if "geo" in record:
+                    record["geo"] = json.loads(record["geo"])
+                for field in CSV_LIST_FIELDS & record.keys():
+                    record[field] = [item.strip() for item in record[field].split("|") if item.strip()]
+                records.append(record)
+            return records
+        if suffix == ".ndjson":
+            return [json.loads(line) for line in file if line.strip()]
+        return json.load(file)
+
+def sync_document(record: dict) -> dict:
+    """Valida um registro de entrada e monta os campos sincronizáveis"""
+    restaurant = RestaurantCreate(**record)
+    document = restaurant.dict()
+    if document["geo"] is None:
+        document["geo"] = geo_from_location(document["location"])
+    document["name_key"] = name_key(document["name"])
+    return document
+
+async def sync_restaurants(records: list, batch_size: int = 500) -> dict:
+    """Insere ou atualiza restaurantes pelo nome normalizado, em lotes de bulk_write
+    
+    Restaurantes iguais aos do banco não são regravados e nenhum restaurante
+    é removido. Retorna as contagens por resultado.
+    """
+    counts = {"inserted": 0, "updated": 0, "unchanged": 0, "invalid": 0, "duplicated": 0}
+    seen_keys = set()
+    
+    for start in range(0, len(records), batch_size):
+        batch = []
+        for position, record in enumerate(records[start:start + batch_size], start=start):
+            try:
+                document = sync_document(record)
+            except ValidationError as error:
+                counts["invalid"] += 1
+                print(f"⚠️ Registro {position} inválido: {error.errors()[0]['msg']}")
+                continue
+            if document["name_key"] in seen_keys:
+                counts["duplicated"] += 1
+                print(f"⚠️ Registro {position} repete o nome '{document['name']}'")
+                continue
+            seen_keys.add(document["name_key"])
+            batch.append(document)
+        
+        existing = {
+            restaurant["name_key"]: restaurant
+            for restaurant in await mongo.db.restaurants.find(
+                {"name_key": {"$in": [document["name_key"] for document in batch]}},
+                {"_id": 0, "id": 1, **{field: 1 for field in SYNC_FIELDS}}
+            ).to_list(None)
+        }
+        
+        operations = []
+        now = datetime.utcnow()
+        for document in batch:
+            current = existing.get(document["name_key"])
+            if current is None:
+                operations.append(InsertOne({**Restaurant(**document).dict(), "name_key": document["name_key"]}))
+                counts["inserted"] += 1
+                continue
+            
+            changes = {field: value for field, value in document.items() if current.get(field) != value}
+            if changes:
+                operations.append(UpdateOne({"id": current["id"]}, {"$set": {**changes, "updated_at": now}}))
+                counts["updated"] += 1
+            else:
+                counts["unchanged"] += 1
+        
+        if operations:
+            await mongo.db.restaurants.bulk_write(operations, ordered=False)
+    
+    return counts
+
+async def sync_command(path: str = None, batch_size: int = 500):
+    """Sincroniza o banco com RESTAURANT_DATA ou com um arquivo, sem interação"""
+    
+    records = load_records(path) if path else RESTAURANT_DATA
+    print(f"🔄 Sincronizando {len(records)} restaurantes de {path or 'RESTAURANT_DATA'}...")
+    
+    # Os índices (incluindo o único em name_key) precisam existir antes da gravação
+    await ensure_indexes(mongo.db)
+    counts = await sync_restaurants(records, batch_size)
+    await bump_list_version(mongo.db)
+    stats = await rebuild_stats(mongo.db)
+    
+    print(
+        f"✅ {counts['inserted']} inseridos, {counts['updated']} atualizados, "
+        f"{counts['unchanged']} sem mudança, {counts['invalid']} inválidos, {counts['duplicated']} repetidos"
+    )
+    print(f"📈 Total de restaurantes: {stats['total']}")
+    
+    mongo.close()
+    return counts
+
+async def seed_restaurants(assume_yes: bool = False):
+    """Recria a coleção do zero com os dados iniciais dos restaurantes"""
     
     print("🌱 Iniciando seed do banco de dados...")
     
     # Verificar se já existem restaurantes
-    existing_count = await db.restaurants.count_documents({})
+    existing_count = await mongo.db.restaurants.count_documents({})
     
     if existing_count > 0:
         print(f"ℹ️ Banco já possui {existing_count} restaurantes")
-        response = input("Deseja limpar e recriar os dados? (y/n): ")
+        response = "y" if assume_yes else input("Deseja limpar e recriar os dados? (y/n): ")
         if response.lower() == 'y':
-            await db.restaurants.delete_many({})
+            await mongo.db.restaurants.delete_many({})
             print("🗑️ Dados anteriores removidos")
         else:
             print("❌ Operação cancelada")
@@ -234,37 +368,126 @@ async def seed_restaurants():
     restaurants_to_insert = []
     
     for restaurant_data in RESTAURANT_DATA:
-        restaurant = Restaurant(**restaurant_data)
-        restaurants_to_insert.append(restaurant.dict())
+        restaurant = Restaurant(**{"geo": geo_from_location(restaurant_data["location"]), **restaurant_data})
+        restaurants_to_insert.append({**restaurant.dict(), "name_key": name_key(restaurant.name)})
     
     # Inserir em lote
-    result = await db.restaurants.insert_many(restaurants_to_insert)
+    result = await mongo.db.restaurants.insert_many(restaurants_to_insert)
+    await bump_list_version(mongo.db)
     
     print(f"✅ {len(result.inserted_ids)} restaurantes inseridos com sucesso!")
     
     # Criar índices para melhor performance
-    await db.restaurants.create_index("name")
-    await db.restaurants.create_index("categories")
-    await db.restaurants.create_index("rating")
-    await db.restaurants.create_index("hasPool")
-    await db.restaurants.create_index([("name", "text"), ("location", "text"), ("cuisine", "text")])
+    await ensure_indexes(mongo.db)
     
     print("📊 Índices criados para otimização de busca")
     
-    # Estatísticas
-    total = await db.restaurants.count_documents({})
-    with_pool = await db.restaurants.count_documents({"hasPool": True})
-    avg_rating = await db.restaurants.aggregate([
-        {"$group": {"_id": None, "avg": {"$avg": "$rating"}}}
-    ]).to_list(1)
+    # Estatísticas (também regrava o documento materializado de /stats/overview)
+    stats = await rebuild_stats(mongo.db)
     
     print(f"📈 Estatísticas finais:")
-    print(f"   - Total de restaurantes: {total}")
-    print(f"   - Restaurantes com piscina: {with_pool}")
-    print(f"   - Avaliação média: {round(avg_rating[0]['avg'], 2) if avg_rating else 'N/A'}")
+    print(f"   - Total de restaurantes: {stats['total']}")
+    print(f"   - Restaurantes com piscina: {stats['with_pool']}")
+    print(f"   - Avaliação média: {round(stats['rating_sum'] / stats['rating_count'], 2) if stats['rating_count'] else 'N/A'}")
     
     # Fechar conexão
-    client.close()
+    mongo.close()
+
+async def migrate_name_keys(batch_size: int = 1000):
+    """Preenche `name_key` nos restaurantes antigos e cria o índice único"""
+    
+    print("🔑 Preenchendo name_key nos restaurantes existentes...")
+    
+    operations = []
+    updated = 0
+    async for restaurant in mongo.db.restaurants.find({"name_key": {"$exists": False}}, {"_id": 1, "name": 1}):
+        operations.append(UpdateOne({"_id": restaurant["_id"]}, {"$set": {"name_key": name_key(restaurant["name"])}}))
+        if len(operations) >= batch_size:
+            result = await mongo.db.restaurants.bulk_write(operations, ordered=False)
+            updated += result.modified_count
+            operations = []
+    if operations:
+        result = await mongo.db.restaurants.bulk_write(operations, ordered=False)
+        updated += result.modified_count
+    
+    print(f"✅ {updated} restaurantes atualizados")
+    
+    # Nomes repetidos impedem a criação do índice único
+    duplicates = await mongo.db.restaurants.aggregate([
+        {"$group": {"_id": "$name_key", "names": {"$push": "$name"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}}
+    ]).to_list(None)
+    
+    if duplicates:
+        print("❌ Nomes repetidos encontrados; corrija-os e rode a migração novamente:")
+        for duplicate in duplicates:
+            print(f"   - {', '.join(duplicate['names'])}")
+    else:
+        await ensure_indexes(mongo.db)
+        print("📊 Índice único em name_key criado")
+    
+    mongo.close()
+
+async def backfill_geo(batch_size: int = 1000):
+    """Preenche `geo` (uma única vez) a partir do texto de `location`"""
+    
+    print("🗺️ Preenchendo geo a partir de location...")
+    
+    operations = []
+    updated = 0
+    skipped = 0
+    # updated_at e a versão das listagens mudam junto para invalidar ETags e
+    # Last-Modified já entregues
+    now = datetime.utcnow()
+    async for restaurant in mongo.db.restaurants.find({"geo": None}, {"_id": 1, "location": 1}):
+        geo = geo_from_location(restaurant.get("location") or "")
+        if geo is None:
+            skipped += 1
+            continue
+        operations.append(UpdateOne({"_id": restaurant["_id"]}, {"$set": {"geo": geo, "updated_at": now}}))
+        if len(operations) >= batch_size:
+            result = await mongo.db.restaurants.bulk_write(operations, ordered=False)
+            updated += result.modified_count
+            operations = []
+    if operations:
+        result = await mongo.db.restaurants.bulk_write(operations, ordered=False)
+        updated += result.modified_count
+    if updated:
+        await bump_list_version(mongo.db)
+    
+    print(f"✅ {updated} restaurantes com geo preenchido; {skipped} sem localidade reconhecida")
+    
+    await ensure_indexes(mongo.db)
+    mongo.close()
+
+async def rebuild_stats_command():
+    """Recalcula o documento de estatísticas sem mexer nos restaurantes"""
+    stats = await rebuild_stats(mongo.db)
+    print(f"📈 Estatísticas recalculadas: {stats['total']} restaurantes")
+    mongo.close()
 
 if __name__ == "__main__":
-    asyncio.run(seed_restaurants())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Seed e manutenção da coleção de restaurantes")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--reset", action="store_true", help="Apaga tudo e reinsere RESTAURANT_DATA")
+    mode.add_argument("--rebuild-stats", action="store_true", help="Recalcula o documento de estatísticas")
+    mode.add_argument("--migrate-name-keys", action="store_true", help="Preenche name_key e cria o índice único")
+    mode.add_argument("--backfill-geo", action="store_true", help="Preenche geo a partir de location")
+    parser.add_argument("--file", help="Arquivo .json, .ndjson ou .csv para sincronizar (padrão: RESTAURANT_DATA)")
+    parser.add_argument("--batch-size", type=int, default=500, help="Documentos por bulk_write")
+    parser.add_argument("--yes", action="store_true", help="Não pede confirmação no --reset")
+    args = parser.parse_args()
+    
+    # Conexão configurada pelas mesmas variáveis da API (ver database.py)
+    mongo.connect()
+    
+    if args.reset:
+        asyncio.run(seed_restaurants(assume_yes=args.yes))
+    elif args.rebuild_stats:
+        asyncio.run(rebuild_stats_command())
+    elif args.migrate_name_keys:
+        asyncio.run(migrate_name_keys(args.batch_size))
+    elif args.backfill_geo:
+        asyncio.run(backfill_geo(args.batch_size))
+    else:
+        asyncio.run(sync_command(args.file, args.batch_size))
\ No newline at end of file
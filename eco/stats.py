@@ -0,0 +1,124 @@
+import asyncio
+from datetime import datetime
+from typing import Optional
+from pymongo import UpdateOne
+
+# Documento materializado com as estatísticas gerais (coleção restaurant_stats)
+STATS_ID = "overview"
+
+# Versão das listagens (mesma coleção): incrementada a cada escrita, inclusive
+# remoções, e usada na ETag de GET /restaurants/
+LIST_VERSION_ID = "list_version"
+
+def _contribution(restaurant: dict, sign: int) -> dict:
+    contribution = {"total": sign}
+    if restaurant.get("hasPool"):
+        contribution["with_pool"] = sign
+    for category in set(restaurant.get("categories") or []):
+        contribution[f"categories.{category}"] = sign
+    if restaurant.get("rating") is not None:
+        contribution["rating_sum"] = sign * restaurant["rating"]
+        contribution["rating_count"] = sign
+    return contribution
+
+def stats_delta(before: Optional[dict], after: Optional[dict]) -> dict:
+    """Calcula os incrementos ($inc) causados pela troca de `before` por `after`"""
+    delta = {}
+    for restaurant, sign in ((before, -1), (after, 1)):
+        if restaurant is None:
+            continue
+        for field, value in _contribution(restaurant, sign).items():
+            delta[field] = delta.get(field, 0) + value
+    return {field: value for field, value in delta.items() if value != 0}
+
+def _list_version_update() -> UpdateOne:
+    """Incremento da versão das listagens; cria o documento na primeira escrita"""
+    return UpdateOne(
+        {"_id": LIST_VERSION_ID},
+        {"$inc": {"version": 1}, "$setOnInsert": {"created_at": datetime.utcnow()}},
+        upsert=True
+    )
+
+async def apply_stats_delta(db, delta: dict):
+    """Aplica os incrementos às estatísticas e à versão das listagens em um único bulk_write
+
+    O documento de estatísticas só é incrementado se já existir: sem ele não
+    há base, e rebuild_stats o recria do zero na próxima leitura.
+    """
+    operations = [_list_version_update()]
+    if delta:
+        operations.insert(0, UpdateOne({"_id": STATS_ID}, {"$inc": delta}))
+    await db.restaurant_stats.bulk_write(operations, ordered=False)
+
+async def bump_list_version(db):
+    """Incrementa só a versão das listagens (escritas fora da API, como as do seeder)"""
+    await db.restaurant_stats.bulk_write([_list_version_update()])
+
+async def get_list_version(db) -> str:
+    """Versão atual das listagens
+
+    Inclui a data de criação do contador, para que ele recomeçar do zero (ex.:
+    coleção apagada) não repita versões já entregues.
+    """
+    document = await db.restaurant_stats.find_one({"_id": LIST_VERSION_ID})
+    if document is None:
+        return "0"
+    return f"{document['created_at'].isoformat()}:{document['version']}"
+
+async def compute_stats(db) -> dict:
+    """Recalcula as estatísticas a partir da coleção de restaurantes"""
+    category_pipeline = [
+        {"$unwind": "$categories"},
+        {"$group": {"_id": "$categories", "count": {"$sum": 1}}}
+    ]
+    rating_pipeline = [
+        {"$match": {"rating": {"$ne": None}}},
+        {"$group": {"_id": None, "sum": {"$sum": "$rating"}, "count": {"$sum": 1}}}
+    ]
+
+    total, with_pool, category_stats, rating_stats = await asyncio.gather(
+        db.restaurants.count_documents({}),
+        db.restaurants.count_documents({"hasPool": True}),
+        db.restaurants.aggregate(category_pipeline).to_list(None),
+        db.restaurants.aggregate(rating_pipeline).to_list(1)
+    )
+
+    return {
+        "_id": STATS_ID,
+        "total": total,
+        "with_pool": with_pool,
+        "categories": {item["_id"]: item["count"] for item in category_stats},
+        "rating_sum": rating_stats[0]["sum"] if rating_stats else 0,
+        "rating_count": rating_stats[0]["count"] if rating_stats else 0,
+        "rebuilt_at": datetime.utcnow()
+    }
+
+async def rebuild_stats(db) -> dict:
+    """Substitui o documento de estatísticas por uma contagem completa"""
+    stats = await compute_stats(db)
+    await db.restaurant_stats.replace_one({"_id": STATS_ID}, stats, upsert=True)
+    return stats
+
+async def get_overview(db) -> dict:
+    """Lê o documento de estatísticas no formato de /stats/overview"""
+    stats = await db.restaurant_stats.find_one({"_id": STATS_ID})
+    if stats is None:
+        stats = await rebuild_stats(db)
+
+    total = stats.get("total", 0)
+    with_pool = stats.get("with_pool", 0)
+    rating_count = stats.get("rating_count", 0)
+    category_distribution = sorted(
+        ({"_id": category, "count": count} for category, count in stats.get("categories", {}).items() if count > 0),
+        key=lambda item: item["count"],
+        reverse=True
+    )
+
+    return {
+        "total_restaurants": total,
+        "restaurants_with_pool": with_pool,
+        "pool_percentage": round((with_pool / total * 100), 2) if total > 0 else 0,
+        "category_distribution": category_distribution,
+        "average_rating": round(stats.get("rating_sum", 0) / rating_count, 2) if rating_count else 0,
+        "rated_restaurants": rating_count
+    }
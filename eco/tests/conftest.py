@@ -0,0 +1,15 @@
+import sys
+import types
+from pathlib import Path
+
+# Os módulos da API importam uns aos outros pelo nome (ex.: `from database import mongo`)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# No deploy o modelo fica em models/restaurant.py; aqui ele está em eco/restaurant.py
+import restaurant
+
+models = types.ModuleType("models")
+models.__path__ = []
+models.restaurant = restaurant
+sys.modules.setdefault("models", models)
+sys.modules.setdefault("models.restaurant", restaurant)
@@ -0,0 +1,128 @@
+import asyncio
+import restaurants
+from changefeed import RESYNC_EVENT, ChangeFeed, Subscription
+from search_index import NameIndex
+
+def change(operation: str, restaurant_id: str, categories: list, token: int) -> dict:
+    """Evento no formato do change stream, com o documento completo"""
+    return {
+        "_id": {"_data": token},
+        "operationType": operation,
+        "fullDocument": {"id": restaurant_id, "name": restaurant_id, "categories": categories}
+    }
+
+def stub_source(*streams):
+    """Fonte que entrega um stream por chamada; o último fica aberto depois dos eventos
+
+    Guarda o resume token recebido em cada chamada.
+    """
+    calls = []
+
+    async def source(resume_token):
+        calls.append(resume_token)
+        for item in streams[len(calls) - 1]:
+            yield item
+        if len(calls) == len(streams):
+            await asyncio.Event().wait()
+
+    return source, calls
+
+async def collect(subscription: Subscription, timeout: float = 0.5) -> list:
+    """Eventos recebidos até a fila ficar parada por `timeout` segundos"""
+    events = []
+    while True:
+        event = await subscription.get(timeout)
+        if event is None:
+            return events
+        events.append(event)
+
+def test_events_fan_out_to_subscribers_by_category():
+    source, _ = stub_source([
+        change("insert", "tacaca-da-ilha", ["rio-guama"], 1),
+        change("update", "balneario-do-sol", ["piscina"], 2)
+    ])
+
+    async def run():
+        feed = ChangeFeed(source=source, retry_seconds=0)
+        received = []
+
+        async def listener(event):
+            received.append(event["id"])
+
+        feed.add_listener(listener)
+        everything = feed.subscribe()
+        pools = feed.subscribe(["piscina"])
+        feed.start()
+        try:
+            return received, await collect(everything), await collect(pools)
+        finally:
+            await feed.stop()
+
+    received, everything, pools = asyncio.run(run())
+
+    assert received == ["tacaca-da-ilha", "balneario-do-sol"]
+    assert [(event["type"], event["id"]) for event in everything] == [
+        ("created", "tacaca-da-ilha"),
+        ("updated", "balneario-do-sol")
+    ]
+    assert [event["id"] for event in pools] == ["balneario-do-sol"]
+
+def test_feed_restarts_with_resync_when_the_stream_ends():
+    # O primeiro stream termina (ex.: invalidado); o segundo fica aberto
+    source, calls = stub_source([change("insert", "tacaca-da-ilha", ["rio-guama"], 1)], [])
+
+    async def run():
+        feed = ChangeFeed(source=source, retry_seconds=0)
+        subscription = feed.subscribe()
+        feed.start()
+        try:
+            events = await collect(subscription)
+            return events, feed.running
+        finally:
+            await feed.stop()
+
+    events, running = asyncio.run(run())
+
+    assert [event["type"] for event in events] == ["created", "resync"]
+    assert running
+    assert calls == [None, None]
+
+def test_slow_subscriber_gets_a_single_resync():
+    async def run():
+        subscription = Subscription(max_queued=2)
+        for position in range(5):
+            subscription.push({"type": "created", "id": f"restaurante-{position}", "categories": []})
+        return subscription, await collect(subscription, timeout=0.01)
+
+    subscription, events = asyncio.run(run())
+
+    assert events == [RESYNC_EVENT]
+    assert subscription.dropped == 4
+
+class FakeRestaurants:
+    """Coleção com o mínimo usado por load_name_index"""
+
+    def __init__(self, documents: list):
+        self.documents = documents
+
+    def find(self, filters: dict, projection: dict):
+        return self
+
+    async def to_list(self, length):
+        return list(self.documents)
+
+class FakeDatabase:
+    def __init__(self, documents: list):
+        self.restaurants = FakeRestaurants(documents)
+
+def test_resync_reloads_the_suggestion_index(monkeypatch):
+    # Sem imagem anterior, a remoção feita por outra instância chega como resync
+    index = NameIndex()
+    index.load([{"id": "tacaca-da-ilha", "name": "Tacacá da Ilha"}, {"id": "balneario-do-sol", "name": "Balneário do Sol"}])
+    monkeypatch.setattr(restaurants, "name_index", index)
+    monkeypatch.setattr(restaurants.mongo, "_db", FakeDatabase([{"id": "balneario-do-sol", "name": "Balneário do Sol"}]))
+
+    asyncio.run(restaurants.apply_feed_event(RESYNC_EVENT))
+
+    assert index.search("tacaca") == []
+    assert index.search("balneario") == ["Balneário do Sol"]
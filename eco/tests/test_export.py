@@ -0,0 +1,74 @@
+import asyncio
+import os
+from datetime import datetime
+import pytest
+from restaurants import EXPORT_COLUMNS, export_csv, export_ndjson
+
+pytestmark = pytest.mark.skipif(not os.path.exists("/proc/self/status"), reason="RSS lido de /proc (Linux)")
+
+class FakeCursor:
+    """Cursor assíncrono que gera os documentos sob demanda, como o do Motor"""
+
+    def __init__(self, count: int):
+        self.count = count
+
+    def __aiter__(self):
+        return self._documents()
+
+    async def _documents(self):
+        for position in range(self.count):
+            yield {
+                "id": f"restaurante-{position}",
+                "name": f"Restaurante {position}",
+                "image": f"https://images.example.com/restaurants/{position}.jpg",
+                "instagram": None,
+                "hasPool": position % 3 == 0,
+                "hours": "Todos os dias - 10h às 22h",
+                "phones": ["(91) 90000-0000", "(91) 91111-1111"],
+                "email": None,
+                "categories": ["restaurants", "rio-guama"],
+                "location": "9.2 km - Rio Guamá",
+                "geo": {"type": "Point", "coordinates": [-48.4547, -1.4736]},
+                "comments": "142 avaliações",
+                "rating": 4.2,
+                "cuisine": "Brasileira, Frutos do mar",
+                "created_at": datetime(2024, 1, 1),
+                "updated_at": datetime(2024, 1, 1)
+            }
+
+def current_rss_kb() -> int:
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    raise RuntimeError("VmRSS não encontrado")
+
+def export_growth_kb(make_export, rows: int) -> int:
+    """Consome a exportação inteira e retorna o quanto o RSS subiu acima do início"""
+
+    async def consume():
+        start = current_rss_kb()
+        peak = start
+        lines = 0
+        async for chunk in make_export(FakeCursor(rows)):
+            lines += 1
+            if lines % 1000 == 0:
+                peak = max(peak, current_rss_kb())
+        return max(peak, current_rss_kb()) - start, lines
+
+    growth, lines = asyncio.run(consume())
+    assert lines >= rows
+    return growth
+
+@pytest.mark.parametrize("make_export", [
+    export_ndjson,
+    lambda cursor: export_csv(cursor, EXPORT_COLUMNS)
+], ids=["ndjson", "csv"])
+def test_export_memory_stays_flat(make_export):
+    # Aquece o alocador com uma exportação pequena antes de medir
+    export_growth_kb(make_export, 1_000)
+    small = export_growth_kb(make_export, 1_000)
+    large = export_growth_kb(make_export, 200_000)
+
+    # 200 mil linhas somam mais de 100 MB; montadas em memória, o RSS cresceria junto
+    assert large - small < 16 * 1024